@@ -0,0 +1,119 @@
+"""
+Compare the memory held by the comet ASTs of the example and template comets
+in the former dict representation, with a parent link and nested span dicts
+on every element and attr, and with the slotted nodes and the DEBUG only span
+table.
+
+    python benchmarks/ast_memory.py
+"""
+
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from htmst.structures import AttrNode, DoubleTagNode, SingleTagNode, TextNode
+
+from picomet.tokenizers import htmst
+from picomet.types import (
+    AstAttr,
+    DoubleQuoteEscapedStr,
+    ElementDoubleTag,
+    ElementSingleTag,
+    Span,
+    Spans,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+COPIES = 50
+
+
+def corpus() -> list[DoubleTagNode]:
+    roots: list[DoubleTagNode] = []
+    for directory in [ROOT / "example", ROOT / "src/picomet/template"]:
+        for path in sorted(directory.glob("**/comets/**/*.html*")):
+            if "node_modules" not in path.parts:
+                roots.append(htmst(path.read_text()))
+    return roots
+
+
+def value(attr: AttrNode) -> DoubleQuoteEscapedStr | None:
+    if attr.value is None:
+        return None
+    return DoubleQuoteEscapedStr(attr.value)
+
+
+def span_dict(node: Any) -> dict[str, dict[str, int]]:
+    return {
+        "start": {"row": node.start.row, "col": node.start.col},
+        "end": {"row": node.end.row, "col": node.end.col},
+    }
+
+
+def span_tuple(node: Any) -> Span:
+    return (node.start.row, node.start.col, node.end.row, node.end.col)
+
+
+def before(node: Any, parent: dict[str, Any] | None = None) -> Any:
+    if isinstance(node, TextNode):
+        return node.text
+    element: dict[str, Any] = {
+        "tag": node.tag,
+        "attrs": [(a.name, value(a), span_dict(a)) for a in node.attrs],
+        "parent": parent,
+        "span": span_dict(node),
+    }
+    if isinstance(node, DoubleTagNode):
+        element["children"] = [
+            before(child, element)
+            for child in node.children
+            if isinstance(child, TextNode | DoubleTagNode | SingleTagNode)
+        ]
+    return element
+
+
+def after(node: Any, spans: Spans | None) -> Any:
+    if isinstance(node, TextNode):
+        return node.text
+    index = -1
+    if spans is not None:
+        spans.append((span_tuple(node), {a.name: span_tuple(a) for a in node.attrs}))
+        index = len(spans) - 1
+    attrs = [AstAttr(a.name, value(a)) for a in node.attrs]
+    if isinstance(node, DoubleTagNode):
+        element = ElementDoubleTag(node.tag, attrs, index=index)
+        element.children = [
+            after(child, spans)
+            for child in node.children
+            if isinstance(child, TextNode | DoubleTagNode | SingleTagNode)
+        ]
+        return element
+    return ElementSingleTag(node.tag, attrs, index)
+
+
+def measure(build: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main() -> None:
+    roots = corpus()
+    old = measure(lambda: [before(root) for _ in range(COPIES) for root in roots])
+    new = measure(
+        lambda: [
+            (after(root, spans := []), spans) for _ in range(COPIES) for root in roots
+        ]
+    )
+    pro = measure(lambda: [after(root, None) for _ in range(COPIES) for root in roots])
+    print(f"{len(roots)} comets x {COPIES}")
+    print(f"dicts         {old / 1024:9.0f} KB")
+    print(f"debug         {new / 1024:9.0f} KB  -{(1 - new / old) * 100:.0f}%")
+    print(f"build         {pro / 1024:9.0f} KB  -{(1 - pro / old) * 100:.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compare the list scanned dependency graph with DependencyGraph on a project
+with thousands of comets: finding the tailwind content of every layout and
+the dependents to remap after editing a component.
+
+    python benchmarks/dependency_graph.py
+"""
+
+import random
+import time
+
+from picomet.graph import DependencyGraph
+
+LAYOUTS = 20
+PAGES = 2000
+COMPONENTS = 2000
+
+
+def project() -> dict[str, list[str]]:
+    random.seed(0)
+    dgraph: dict[str, list[str]] = {}
+
+    def add_dep(component: str, dependent: str) -> None:
+        dgraph.setdefault(component, [])
+        if dependent not in dgraph[component]:
+            dgraph[component].append(dependent)
+
+    for i in range(1, LAYOUTS):
+        add_dep(f"layout{random.randrange(i)}", f"layout{i}")
+    for i in range(PAGES):
+        add_dep(f"layout{random.randrange(LAYOUTS)}", f"page{i}")
+        for _ in range(3):
+            add_dep(f"component{random.randrange(COMPONENTS)}", f"page{i}")
+    for i in range(COMPONENTS - 200):
+        add_dep(f"component{random.randrange(i + 1, COMPONENTS)}", f"component{i}")
+    return dgraph
+
+
+def content_before(dgraph: dict[str, list[str]], layout: str) -> set[str]:
+    content: list[str] = []
+
+    def find_depending(f: str) -> None:
+        if f not in content:
+            content.append(f)
+        for d1 in dgraph:
+            for d2 in dgraph[d1]:
+                if d2 == f:
+                    find_depending(d1)
+
+    def find_depended(f: str) -> None:
+        if f not in content:
+            content.append(f)
+        for d in dgraph.get(f, []):
+            find_depended(d)
+            find_depending(d)
+
+    find_depending(layout)
+    find_depended(layout)
+    return set(content)
+
+
+def dependents_before(dgraph: dict[str, list[str]], path: str) -> set[str]:
+    dependents: set[str] = set()
+
+    def update_depended(p: str) -> None:
+        for d in dgraph.get(p, []):
+            dependents.add(d)
+            update_depended(d)
+
+    update_depended(path)
+    return dependents
+
+
+def main() -> None:
+    edges = project()
+    graph = DependencyGraph(edges)
+    layouts = [f"layout{i}" for i in range(0, LAYOUTS, 5)]
+    leaves = [f"component{i}" for i in range(COMPONENTS - 5, COMPONENTS)]
+
+    start = time.perf_counter()
+    before = [content_before(edges, layout) for layout in layouts]
+    before += [dependents_before(edges, leaf) for leaf in leaves]
+    before_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = [graph.related(layout) for layout in layouts]
+    after += [set(graph.sort(graph.all_dependents(leaf))) for leaf in leaves]
+    after_time = time.perf_counter() - start
+
+    assert before == after
+    print(
+        f"{len(graph.dependents)} components, {LAYOUTS} layouts"
+        f"  lists {before_time * 1000:9.2f} ms"
+        f"  graph {after_time * 1000:7.2f} ms"
+        f"  x{before_time / after_time:.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
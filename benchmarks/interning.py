@@ -0,0 +1,135 @@
+"""
+Compare building the comet trees of the example and template comets again and
+again with fresh objects and with interned tag names, attrs, static text and
+expression code objects.
+
+    python benchmarks/interning.py
+"""
+
+import gc
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from htmst.structures import DoubleTagNode, SingleTagNode, TextNode
+
+from picomet import interning
+from picomet.scanner import scan
+from picomet.tokenizers import streaming
+from picomet.types import (
+    AstAttr,
+    DoubleQuoteEscapedStr,
+    ElementDoubleTag,
+    ElementSingleTag,
+    StrCode,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+COPIES = 50
+
+
+def corpus() -> dict[str, str]:
+    sources: dict[str, str] = {}
+    for directory in [ROOT / "example", ROOT / "src/picomet/template"]:
+        for path in sorted(directory.glob("**/comets/**/*.html*")):
+            if "node_modules" not in path.parts:
+                sources[str(path)] = path.read_text()
+    return sources
+
+
+def fresh_code(string: str, filename: str) -> StrCode:
+    code = StrCode.__new__(StrCode)
+    code.string = string
+    code.filename = filename
+    code.code = compile(string, filename, "eval")
+    return code
+
+
+def fresh_element(cls: type, tag: str, attrs: list[AstAttr]) -> Any:
+    element = cls.__new__(cls)
+    element.tag = tag
+    element.attrs = attrs
+    element.index = -1
+    if cls is ElementDoubleTag:
+        element.children = []
+        element.file = None
+        element.isBase = False
+    return element
+
+
+def build(node: Any, path: str, interned: bool) -> list[Any]:
+    if isinstance(node, TextNode):
+        nodes: list[Any] = []
+        previous = 0
+        for interpolation in scan(node.text)[0]:
+            nodes.append(node.text[previous : interpolation.start])
+            if interpolation.delimiter == "{$":
+                expression = interpolation.expression
+                nodes.append(
+                    StrCode(expression, path)
+                    if interned
+                    else fresh_code(expression, path)
+                )
+            previous = interpolation.end
+        nodes.append(node.text[previous:])
+        if interned:
+            return [interning.intern_str(n) if type(n) is str else n for n in nodes]
+        return nodes
+    if not isinstance(node, DoubleTagNode | SingleTagNode):
+        return []
+    attrs = [
+        AstAttr(a.name, None if a.value is None else DoubleQuoteEscapedStr(a.value))
+        for a in node.attrs
+    ]
+    if isinstance(node, SingleTagNode):
+        if interned:
+            return [ElementSingleTag(node.tag, attrs)]
+        return [fresh_element(ElementSingleTag, node.tag, attrs)]
+    if interned:
+        element = ElementDoubleTag(node.tag, attrs)
+    else:
+        element = fresh_element(ElementDoubleTag, node.tag, attrs)
+    for child in node.children:
+        element.children += build(child, path, interned)
+    return [element]
+
+
+def measure(make: Callable[[], Any]) -> tuple[float, int]:
+    gc.collect()
+    start = time.perf_counter()
+    make()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    kept = make()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return elapsed, size
+
+
+def main() -> None:
+    sources = corpus()
+
+    def comets(interned: bool) -> list[list[Any]]:
+        return [
+            build(streaming(source), path, interned)
+            for _ in range(COPIES)
+            for path, source in sources.items()
+        ]
+
+    fresh_time, fresh_size = measure(lambda: comets(False))
+    interned_time, interned_size = measure(lambda: comets(True))
+    print(f"{len(sources)} comets x {COPIES}")
+    print(f"fresh    {fresh_time * 1000:8.2f} ms  {fresh_size / 1024:8.0f} KB")
+    print(
+        f"interned {interned_time * 1000:8.2f} ms  {interned_size / 1024:8.0f} KB"
+        f"  -{(1 - interned_size / fresh_size) * 100:.0f}%"
+    )
+    print("shared", interning.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare the interpolation scanner with the regex it replaced on large,
+content heavy template text, and check that it stays linear on openings
+inside the unterminated strings of earlier ones.
+
+    python benchmarks/interpolation.py
+"""
+
+import re
+import timeit
+
+from picomet.scanner import scan
+
+x_re = re.compile(
+    r"(?:(?:({\$)\s*((?:\"(?:\\\"|[^\"])*\"|'(?:\\'|[^'])*'|[^\"'\n])*?)\s*\$})|(({{)\s*((?:\"(?:\\\"|[^\"])*\"|'(?:\\'|[^'])*'|[^\"'\n])*?)\s*}})|({%\s*((?:\"(?:\\\"|[^\"])*\"|'(?:\\'|[^'])*'|[^\"'\n])*?)\s*%}))"
+)
+
+PARAGRAPH = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit. {$ blog.title $} "
+    "sed do eiusmod {{ blog.created_at|date:'j M Y' }} tempor incididunt, "
+    'ut labore et dolore {$ f"{user.first_name} {user.last_name}" $} magna '
+    'aliqua. "Quoted" text with \'apostrophes\' and {% now "Y" %} tags.\n'
+)
+QUOTED = (
+    "<p>{$ \"Long string literal with punctuation, 'nested' quotes and $} \" * 3 $}"
+    ' and {{ blog.body|default:"No content was provided for this blog" }}</p>\n'
+)
+LONG_LINE = "It's a {{ long line with 'quotes' and no closing " * 40 + "\n"
+# every opening is inside a quoted string of the one before, each failing one
+# used to scan again to the end of the text
+PATHOLOGICAL = ['{$ "\\" ', "{{ '\\' "]
+
+
+def regex(text: str) -> list[tuple[int, int]]:
+    return [match.span() for match in re.finditer(x_re, text)]
+
+
+def scanner(text: str) -> list[tuple[int, int]]:
+    return [(i.start, i.end) for i in scan(text)[0]]
+
+
+def main() -> None:
+    for name, text in [
+        ("content", PARAGRAPH * 2000),
+        ("quoted", QUOTED * 4000),
+        ("unterminated", LONG_LINE * 5),
+    ]:
+        assert regex(text) == scanner(text), name
+        regex_time = min(timeit.repeat(lambda: regex(text), number=5, repeat=3))
+        scanner_time = min(timeit.repeat(lambda: scanner(text), number=5, repeat=3))
+        print(
+            f"{name:<14} {len(text) / 1024:8.0f} KB"
+            f"  regex {regex_time * 200:8.2f} ms"
+            f"  scanner {scanner_time * 200:8.2f} ms"
+            f"  x{regex_time / scanner_time:.1f}"
+        )
+    for unit in PATHOLOGICAL:
+        times = []
+        for n in [1000, 2000, 4000, 8000]:
+            text = unit * n
+            times.append(min(timeit.repeat(lambda: scanner(text), number=1, repeat=3)))
+            print(f"{unit!r:<14} x{n:<6} {times[-1] * 1000:8.2f} ms")
+        # doubling the text twice should not multiply the time by 16
+        assert times[-1] < times[1] * 8, unit
+
+
+if __name__ == "__main__":
+    main()
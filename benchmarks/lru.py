@@ -0,0 +1,64 @@
+"""
+Serve a skewed stream of requests over thousands of comets with unbounded
+caches and with a cache budget, comparing the estimated memory held, the hit
+rate and the time spent loading evicted comets again.
+
+    python benchmarks/lru.py
+"""
+
+import random
+import time
+from collections.abc import MutableMapping
+
+from picomet.lru import Budget, LRUCache
+from picomet.types import AstAttr, DoubleQuoteEscapedStr, ElementDoubleTag
+
+COMETS = 2000
+REQUESTS = 100000
+BUDGET = 16 * 1024 * 1024
+
+
+def load(path: str) -> ElementDoubleTag:
+    """Stand in for load_comet, a comet of about a hundred nodes."""
+    root = ElementDoubleTag("Fragment", [], file=path)
+    for i in range(20):
+        section = ElementDoubleTag(
+            "section", [AstAttr("class", DoubleQuoteEscapedStr(f"s{i}"))]
+        )
+        for j in range(4):
+            section.children.append(ElementDoubleTag("p", [], [f"{path} {i} {j}"]))
+        root.children.append(section)
+    return root
+
+
+def serve(cache: MutableMapping[str, ElementDoubleTag], paths: list[str]) -> float:
+    loading = 0.0
+    for path in paths:
+        if cache.get(path) is None:
+            start = time.perf_counter()
+            cache[path] = load(path)
+            loading += time.perf_counter() - start
+    return loading
+
+
+def main() -> None:
+    random.seed(0)
+    comets = [f"comet{i}.html" for i in range(COMETS)]
+    weights = [1 / (rank + 1) for rank in range(COMETS)]
+    paths = random.choices(comets, weights, k=REQUESTS)
+
+    for name, limit in [("unbounded", 2**62), ("budget", BUDGET)]:
+        budget = Budget(limit)
+        cache: LRUCache[ElementDoubleTag] = LRUCache(budget)
+        loading = serve(cache, paths)
+        stats = cache.stats()
+        print(
+            f"{name:<10} {budget.used / 1024 / 1024:6.1f} MB held"
+            f"  hit rate {stats['hits'] / (stats['hits'] + stats['misses']):.0%}"
+            f"  {stats['evictions']:6d} evictions"
+            f"  loading {loading * 1000:7.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
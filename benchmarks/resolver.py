@@ -0,0 +1,65 @@
+"""
+Compare looking up comet and asset names by checking every directory on disk
+with the Resolver index, on a project with many apps each having its own
+comets and assets.
+
+    python benchmarks/resolver.py
+"""
+
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from picomet.resolver import Resolver
+
+APPS = 40
+FILES = 50
+LOOKUPS = 20000
+
+
+def find_in_dirs(name: str, dirs: list[str]) -> str | None:
+    for d in dirs:
+        directory = Path(d)
+        if directory.is_dir():
+            file = directory / name
+            if file.exists():
+                return file.as_posix()
+    return None
+
+
+def main() -> None:
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        dirs: list[str] = []
+        names: list[str] = []
+        for app in range(APPS):
+            d = Path(tmp, f"app{app}", "assets")
+            (d / "components").mkdir(parents=True)
+            dirs.append(str(d))
+            for i in range(FILES):
+                name = f"components/app{app}_{i}.js"
+                (d / name).write_text("")
+                names.append(name)
+        lookups = [random.choice(names) for _ in range(LOOKUPS)]
+
+        start = time.perf_counter()
+        before = [find_in_dirs(name, dirs) for name in lookups]
+        before_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        resolver = Resolver(lambda: dirs)
+        after = [resolver.find(name) for name in lookups]
+        after_time = time.perf_counter() - start
+
+    assert before == after
+    print(
+        f"{APPS} dirs, {APPS * FILES} files, {LOOKUPS} lookups"
+        f"  disk {before_time * 1000:8.2f} ms"
+        f"  index {after_time * 1000:6.2f} ms"
+        f"  x{before_time / after_time:.0f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Compare the parse throughput of the tokenizer backends on the example and
+template comets, picomet.tests checks that they build the same node trees.
+
+    python benchmarks/tokenizers.py
+"""
+
+import timeit
+from pathlib import Path
+
+from picomet.tokenizers import TOKENIZERS
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def corpus() -> dict[str, str]:
+    sources: dict[str, str] = {}
+    for directory in [ROOT / "example", ROOT / "src/picomet/template"]:
+        for path in sorted(directory.glob("**/comets/**/*.html*")):
+            if "node_modules" not in path.parts:
+                sources[str(path.relative_to(ROOT))] = path.read_text()
+    return sources
+
+
+def main() -> None:
+    sources = corpus()
+    source = "\n".join(sources.values())
+    print(f"{len(sources)} sources, {len(source) / 1024:.0f} KB of comets")
+    timings: dict[str, float] = {}
+    for name, tokenizer in TOKENIZERS.items():
+        timings[name] = min(
+            timeit.repeat(lambda: tokenizer(source), number=5, repeat=3)
+        )
+        print(
+            f"{name:<10} {timings[name] * 200:8.2f} ms"
+            f"  {len(source) * 5 / timings[name] / 1024 / 1024:6.2f} MB/s"
+            f"  x{timings['htmst'] / timings[name]:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
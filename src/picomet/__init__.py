@@ -3,6 +3,10 @@ from types import ModuleType
 
 from django.http import HttpRequest
 
+from picomet.lazy import lazy, lazy_context
+
+__all__ = ["call_action", "lazy", "lazy_context"]
+
 cache: dict[str, ModuleType] = {}
 
 
@@ -28,58 +28,67 @@ function connect() {
       interface LinkChange extends AssetChange {
         link: string;
       }
-      const data = JSON.parse(event.data) as
+      type Change =
         | BaseChange
         | TemplateChange
         | StyleChange
         | TailwindChange
         | ScriptChange
         | LinkChange;
-      if ("base" in data) {
+      const { batch } = JSON.parse(event.data) as { batch: Change[] };
+      if (batch.some((data) => "base" in data)) {
         location.reload();
-      } else if ("template" in data) {
-        update([`$${data.template}`]).catch(() => {});
-      } else if ("tailwind" in data) {
-        const id = data.tailwind.split(".")[0];
-        const el = document.querySelector(`link[data-tailwind-id="${id}"]`);
-        if (el) {
-          el.setAttribute("href", `${data.staticUrl}${data.tailwind}`);
-        }
-      } else if ("style" in data) {
-        const id = data.style.split(".")[0];
-        const el = document.querySelector(`[data-style-id="${id}"]`);
-        if (el) {
-          el.setAttribute("href", `${data.staticUrl}${data.style}`);
-        }
-      } else if ("script" in data) {
-        const id = data.script.split(".")[0];
-        const el = document.querySelector(`[data-script-id="${id}"]`);
-        if (el) {
-          const cleanup = window[`${id}_cleanup`] as unknown;
-          if (typeof cleanup == "function") {
-            cleanup();
+        return;
+      }
+      const templates = batch
+        .filter((data): data is TemplateChange => "template" in data)
+        .map((data) => `$${data.template}`);
+      if (templates.length) {
+        update(templates).catch(() => {});
+      }
+      for (const data of batch) {
+        if ("tailwind" in data) {
+          const id = data.tailwind.split(".")[0];
+          const el = document.querySelector(`link[data-tailwind-id="${id}"]`);
+          if (el) {
+            el.setAttribute("href", `${data.staticUrl}${data.tailwind}`);
+          }
+        } else if ("style" in data) {
+          const id = data.style.split(".")[0];
+          const el = document.querySelector(`[data-style-id="${id}"]`);
+          if (el) {
+            el.setAttribute("href", `${data.staticUrl}${data.style}`);
+          }
+        } else if ("script" in data) {
+          const id = data.script.split(".")[0];
+          const el = document.querySelector(`[data-script-id="${id}"]`);
+          if (el) {
+            const cleanup = window[`${id}_cleanup`] as unknown;
+            if (typeof cleanup == "function") {
+              cleanup();
+            }
+            import(`${data.staticUrl}${data.script}`)
+              .then((module: object) => {
+                Object.keys(module).forEach((key) => {
+                  if (key == "cleanup") {
+                    window[`${id}_cleanup`] = module[key] as unknown;
+                  } else {
+                    window[key] = module[key] as unknown;
+                  }
+                });
+              })
+              .catch(() => {});
           }
-          import(`${data.staticUrl}${data.script}`)
-            .then((module: object) => {
-              Object.keys(module).forEach((key) => {
-                if (key == "cleanup") {
-                  window[`${id}_cleanup`] = module[key] as unknown;
-                } else {
-                  window[key] = module[key] as unknown;
-                }
-              });
-            })
-            .catch(() => {});
+        } else if ("link" in data) {
+          const id = data.link.split(".")[0];
+          const els = document.querySelectorAll(`[data-asset-id="${id}"]`);
+          els.forEach((el) => {
+            el.setAttribute(
+              el.getAttribute("data-target"),
+              `${data.staticUrl}${data.link}`,
+            );
+          });
         }
-      } else if ("link" in data) {
-        const id = data.link.split(".")[0];
-        const els = document.querySelectorAll(`[data-asset-id="${id}"]`);
-        els.forEach((el) => {
-          el.setAttribute(
-            el.getAttribute("data-target"),
-            `${data.staticUrl}${data.link}`,
-          );
-        });
       }
     }
   });
@@ -1,3 +1,4 @@
+from collections.abc import Iterable
 from json import loads
 from typing import Any, NotRequired, Optional, TypedDict, Unpack
 
@@ -12,9 +13,13 @@ from django.utils.functional import cached_property
 from django.utils.module_loading import import_string
 from django.utils.safestring import mark_safe
 
-from picomet.parser import parse
+from picomet import interning
+from picomet.lazy import process_context
+from picomet.parser import LAZY, budget, compile_layouts, parse
+from picomet.queries import QueryTransformer, get_report
+from picomet.tokenizers import Tokenizer, get_tokenizer
 from picomet.transformer import Transformer
-from picomet.types import Loops
+from picomet.types import Ast, AstMap, Loops
 
 
 class Template:
@@ -31,12 +36,36 @@ class Template:
         self.origin = origin
         self.engine = engine
         self.source = str(template_string)  # May be lazy
+        self.ast: Ast | None = None
+        self.map: AstMap | None = None
+
+    def bind(self) -> tuple[Ast, AstMap]:
+        """
+        Parse the comet on the first call and keep its ast and map, the engine
+        forgets the template when the comet or one of its components changes.
+        Under a cache budget they are looked up again so that they can be
+        evicted.
+        """
+        if self.ast is None or self.map is None:
+            parser = parse(self.source, self.origin.name)
+            if LAZY:
+                compile_layouts(self.origin.name)
+            if budget is not None:
+                return parser.ast, parser.map
+            self.ast, self.map = parser.ast, parser.map
+        return self.ast, self.map
 
     def render(
         self, context: dict[str, Any], targets: list[str], keys: Loops
     ) -> dict | str:
-        parser = parse(self.source, self.origin.name)
-        transformer = Transformer(parser.ast, parser.map, context, targets, keys)
+        ast, map = self.bind()
+        report = get_report()
+        if report is None:
+            transformer = Transformer(ast, map, context, targets, keys)
+        else:
+            transformer = QueryTransformer(
+                ast, map, context, targets, keys, report, str(self.origin.name)
+            )
         transformer.transform()
         return transformer.partials if len(targets) else transformer.compile_content()
 
@@ -45,6 +74,7 @@ class PicometEngineKwargs(TypedDict):
     app_dirs: NotRequired[bool]
     loaders: list[str]
     components: NotRequired[dict[str, str]]
+    tokenizer: NotRequired[str]
 
 
 class PicometEngine(Engine):
@@ -56,17 +86,25 @@ class PicometEngine(Engine):
             "picomet.loaders.AppdirLoader",
         ]
         self.components = kwargs.pop("components", {})
+        self.tokenizer: Tokenizer = get_tokenizer(kwargs.pop("tokenizer", "htmst"))
+        self.templates: dict[str, Template] = {}
         super().__init__(*args, **kwargs)
 
     def get_template(self, template_name: str) -> Template:
         """
         Return a compiled Template object for the given template name,
-        handling template inheritance recursively.
+        handling template inheritance recursively. Templates are resolved once
+        per name.
         """
-        template, origin = self.find_template(template_name)
-        if not hasattr(template, "render"):
-            # template needs to be compiled
-            template = Template(template, origin, template_name, engine=self)
+        template = self.templates.get(template_name)
+        if template is None:
+            found, origin = self.find_template(template_name)
+            if hasattr(found, "render"):
+                template = found
+            else:
+                # template needs to be compiled
+                template = Template(found, origin, template_name, engine=self)
+            self.templates[template_name] = template
         return template
 
     @cached_property
@@ -82,16 +120,38 @@ class PicometTemplates(BaseBackend):
         options = params.pop("OPTIONS").copy()
         super().__init__(params)
         self.engine = PicometEngine(self.dirs, **options)
+        self.renderers: dict[str, Renderer] = {}
 
     def from_string(self, template_code: str) -> "Renderer":
         return Renderer(self.engine.from_string(template_code), self)
 
     def get_template(self, template_name: str) -> Optional["Renderer"]:
-        try:
-            return Renderer(self.engine.get_template(template_name), self)
-        except TemplateDoesNotExist as exc:
-            reraise(exc, self)
-        return None
+        renderer = self.renderers.get(template_name)
+        if renderer is None:
+            try:
+                renderer = self.renderers[template_name] = Renderer(
+                    self.engine.get_template(template_name), self
+                )
+            except TemplateDoesNotExist as exc:
+                reraise(exc, self)
+        return renderer
+
+    def forget(self, paths: Iterable[str] | None = None) -> None:
+        """
+        Drop the cached templates of the comets at paths, or every cached
+        template when names may resolve to other comets.
+        """
+        interning.clear()
+        if paths is None:
+            self.engine.templates.clear()
+            self.renderers.clear()
+            return
+        paths = set(paths)
+        templates = self.engine.templates
+        for name in [n for n, t in templates.items() if t.origin.name in paths]:
+            del templates[name]
+        for name in [n for n, r in self.renderers.items() if r.origin.name in paths]:
+            del self.renderers[name]
 
 
 class Renderer:
@@ -110,7 +170,7 @@ class Renderer:
             context["csrf_input"] = csrf_input_lazy(request)
             context["csrf_token"] = csrf_token_lazy(request)
             for context_processor in self.backend.engine.imported_context_processors:
-                context.update(context_processor(request))
+                context.update(process_context(context_processor, request))
             context["safe"] = mark_safe
         return self.template.render(
             context,
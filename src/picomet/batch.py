@@ -0,0 +1,51 @@
+from collections.abc import Callable, Hashable, Mapping
+from typing import Self
+
+
+class BatchLoader[K: Hashable, V]:
+    """
+    Load the values of many keys with a single call of ``load``. The keys
+    passed to ``prime`` are held until a value is needed, then loaded at once
+    along with it.
+    """
+
+    __slots__ = ("load", "default", "values", "pending")
+
+    def __init__(self, load: Callable[[list[K]], Mapping[K, V]], default: V):
+        self.load = load
+        self.default = default
+        self.values: dict[K, V] = {}
+        self.pending: dict[K, None] = {}
+
+    def prime(self, key: K) -> Self:
+        if key not in self.values:
+            self.pending[key] = None
+        return self
+
+    def dispatch(self) -> None:
+        if self.pending:
+            keys = list(self.pending)
+            self.pending.clear()
+            loaded = self.load(keys)
+            for key in keys:
+                self.values[key] = loaded.get(key, self.default)
+
+    def __getitem__(self, key: K) -> V:
+        if key not in self.values:
+            self.prime(key)
+            self.dispatch()
+        return self.values[key]
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.values or key in self.pending
+
+
+def batch[K: Hashable, V](
+    load: Callable[[list[K]], Mapping[K, V]], default: V | None = None
+) -> BatchLoader[K, V | None]:
+    """
+    Wrap load, a function taking a list of keys and returning their values by
+    key, in a loader for the context of a render. Keys missing from its result
+    get default.
+    """
+    return BatchLoader[K, V | None](load, default)
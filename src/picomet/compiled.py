@@ -0,0 +1,163 @@
+import os
+import re
+import shutil
+import threading
+from collections.abc import Iterable
+from functools import cache
+from hashlib import md5
+from json import dumps, loads
+from pathlib import Path
+from typing import Any
+
+from django.conf import settings
+
+from picomet.node import worker
+
+BASE_DIR: Path = settings.BASE_DIR
+
+# compiled assets by the hash of everything their output depends on, shared by
+# the dev server and the builds
+compiled_dir = BASE_DIR / ".picomet" / "compiled"
+
+sass_import_re = re.compile(r"""@(?:use|forward|import)\s+["']([^"']+)["']""")
+
+
+@cache
+def compiler_version(module: str) -> str:
+    """
+    The version in the package.json of module, read without starting node
+    where the worker finds it.
+    """
+    node_path = [str(BASE_DIR / "node_modules")]
+    node_path += [p for p in os.environ.get("NODE_PATH", "").split(os.pathsep) if p]
+    for directory in node_path:
+        try:
+            with open(os.path.join(directory, module, "package.json")) as f:
+                return str(loads(f.read())["version"])
+        except (OSError, ValueError, KeyError):
+            continue
+    return str(worker.call("version", module, {"module": module}))
+
+
+def resolve_sass(url: str, directory: str, load_paths: list[str]) -> str | None:
+    if url.startswith("sass:") or "://" in url:
+        return None
+    head, name = os.path.split(url)
+    for base in [directory, *load_paths]:
+        for candidate in [
+            f"{name}.scss",
+            f"_{name}.scss",
+            f"{name}.css",
+            os.path.join(name, "_index.scss"),
+            os.path.join(name, "index.scss"),
+            name,
+        ]:
+            path = os.path.join(base, head, candidate)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+def sass_imports(path: str, source: str, load_paths: list[str]) -> list[str]:
+    """The files path uses, forwards or imports, transitively."""
+    seen: dict[str, None] = {}
+    stack = [(path, source)]
+    while stack:
+        current, text = stack.pop()
+        for url in sass_import_re.findall(text):
+            found = resolve_sass(url, os.path.dirname(current), load_paths)
+            if found and found not in seen and found != path:
+                seen[found] = None
+                with open(found) as f:
+                    stack.append((found, f.read()))
+    return sorted(seen)
+
+
+def get_key(module: str, params: dict[str, Any], imports: Iterable[str] = ()) -> str:
+    """
+    The hash of the sources and options in params, the contents of the files
+    they import and the version of the compiler.
+    """
+    key = md5(dumps(params, sort_keys=True).encode())
+    key.update(compiler_version(module).encode())
+    for path in imports:
+        with open(path, "rb") as f:
+            key.update(path.encode())
+            key.update(f.read())
+    return key.hexdigest()
+
+
+def load(key: str) -> str | None:
+    try:
+        with open(compiled_dir / key[:2] / key) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def save(key: str, compiled: str) -> None:
+    directory = compiled_dir / key[:2]
+    directory.mkdir(parents=True, exist_ok=True)
+    temporary = directory / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary, "w") as f:
+        f.write(compiled)
+    os.replace(temporary, directory / key)
+
+
+def copy_file(source: Path | str, destination: Path | str) -> None:
+    """
+    Copy inside the kernel, sharing the blocks on filesystems with reflinks.
+    """
+    if hasattr(os, "copy_file_range"):
+        with open(source, "rb") as fsrc, open(destination, "wb") as fdst:
+            remaining = os.fstat(fsrc.fileno()).st_size
+            try:
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                else:
+                    return
+            except OSError:
+                pass
+    shutil.copyfile(source, destination)
+
+
+def save_blob(path: str, digest: str) -> Path:
+    """
+    Copy path in the cache under its content hash once, the copies of the same
+    file in other apps share it.
+    """
+    directory = compiled_dir / digest[:2]
+    blob = directory / digest
+    if not blob.is_file():
+        directory.mkdir(parents=True, exist_ok=True)
+        temporary = directory / f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp"
+        copy_file(path, temporary)
+        os.replace(temporary, blob)
+    return blob
+
+
+def link_blob(blob: Path, destination: Path) -> None:
+    """Hard link blob at destination, copying it across filesystems."""
+    try:
+        os.link(blob, destination)
+    except OSError:
+        copy_file(blob, destination)
+
+
+def compile_cached(
+    method: str,
+    module: str,
+    path: str,
+    params: dict[str, Any],
+    imports: Iterable[str] = (),
+) -> str:
+    """Run a node worker job unless its output is in the compile cache."""
+    key = get_key(module, params, imports)
+    compiled = load(key)
+    if compiled is None:
+        compiled = str(worker.call(method, path, params))
+        save(key, compiled)
+    return compiled
@@ -1,41 +1,54 @@
 import os
 import shutil
 import site
+import sqlite3
 import sys
 import threading
 import time
-from copy import deepcopy
+import traceback
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from importlib.metadata import version
-from itertools import chain
-from json import dumps, loads
 from pathlib import Path
 from typing import Any
 
 from asgiref.sync import async_to_sync
-from django.apps import apps
 from django.conf import settings
 from django.template import engines
 from django.template.loader import get_template
 from django.urls import URLPattern, URLResolver, get_resolver
 from django.urls.resolvers import RoutePattern
 
+from picomet import interning
 from picomet.backends.picomet import Renderer
-from picomet.helpers import get_comet_id, read_source
-from picomet.loaders import cache_file, fcache, fhash
+from picomet.helpers import hash_source
+from picomet.loaders import (
+    cache_file,
+    cache_hash,
+    fcache,
+    fhash,
+    fstat,
+    read_file,
+    save_fstat,
+)
+from picomet.node import worker
 from picomet.parser import (
-    ASSETFILES_DIRS,
+    LAZY,
     STATIC_URL,
-    Mapper,
     asset_cache,
-    ast_cache,
+    candidates,
     compile_asset,
+    compile_layouts,
     compile_resouce,
     compile_tailwind,
+    deferred_assets,
     dgraph,
     parse,
     twlayouts,
 )
-from picomet.utils import mdhash
+from picomet.resolver import assets, comets
+from picomet.store import store
+from picomet.utils import get_fstat
 
 try:
     from channels.layers import get_channel_layer
@@ -47,111 +60,140 @@ picomet_dir = BASE_DIR / ".picomet"
 cache_dir = picomet_dir / "cache"
 
 
-def setup() -> None:
-    if len(sys.argv) > 1 and sys.argv[1] == "runserver":
+# how long the watched files must stay untouched before a batch is compiled
+DEBOUNCE = 0.2
+# the pause of the lazy warm-up between comets and the niceness of its thread
+WARMUP_PAUSE = 0.05
+WARMUP_NICENESS = 10
 
-        def watch(path: str) -> None:
-            from watchdog.events import FileSystemEvent, FileSystemEventHandler
-            from watchdog.observers import Observer
-
-            class EventHandler(FileSystemEventHandler):
-                def __init__(self, *args: list[Any], **kwargs: dict[str, Any]):
-                    super().__init__(*args, **kwargs)
-                    self.time: dict[str, dict[str, float]] = {"modified": {}}
-
-                def dispatch(self, event: FileSystemEvent) -> None:
-                    src_path = event.src_path
-                    _, ext = os.path.splitext(src_path)
-                    tm = time.time()
-                    if event.event_type == "modified":
-                        self.time["modified"][src_path] = tm
-                    if (
-                        (event.event_type == "closed")
-                        and self.time["modified"].get(src_path)
-                        and ((tm - self.time["modified"][src_path]) <= 1)
-                        and is_file_changed(src_path)
-                    ):
-                        compile_file(src_path)
-
-            event_handler = EventHandler()
-            observer = Observer()
-            observer.schedule(event_handler, path, recursive=True)
-            observer.start()
-            try:
-                while True:
-                    time.sleep(1)
-            except KeyboardInterrupt:
-                observer.stop()
-            observer.join()
 
+def setup() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "runserver":
         if not validate_cache():
             reset_cache()
 
-            parse_patterns(get_resolver().url_patterns)
+            if not LAZY:
+                parse_patterns(get_resolver().url_patterns)
 
-            for layout in twlayouts:
-                compile_tailwind(layout)
+                for layout in twlayouts:
+                    compile_tailwind(layout)
         else:
             thread = threading.Thread(target=validate_fhash, daemon=True)
             thread.start()
 
+        if LAZY and not store.has("meta", "warm"):
+            threading.Thread(target=warm_up, daemon=True).start()
+
         if settings.DEBUG:
             package_dirs = [
                 site.getusersitepackages(),
                 *[path for path in site.getsitepackages()],
             ]
 
-            comet_dirs = list(
-                chain.from_iterable(
-                    [
-                        [str(d) for d in loader.get_dirs()]
-                        for loader in engines["picomet"].engine.template_loaders
-                    ]
-                )
-            )
-            usr_comet_dirs = comet_dirs.copy()
-            for comet_dir in comet_dirs:
-                for package_dir in package_dirs:
-                    if Path(comet_dir).is_relative_to(package_dir):
-                        if comet_dir in usr_comet_dirs:
-                            usr_comet_dirs.remove(comet_dir)
-            for d in usr_comet_dirs:
-                if os.path.isdir(d):
-                    thread = threading.Thread(target=watch, args=(d,), daemon=True)
-                    thread.start()
-
-            asset_dirs = [
-                *[str(d) for d in ASSETFILES_DIRS],
-                *[os.path.join(app.path, "assets") for app in apps.get_app_configs()],
-            ]
-            usr_asset_dirs = asset_dirs.copy()
-            for asset_dir in asset_dirs:
-                for package_dir in package_dirs:
-                    if Path(asset_dir).is_relative_to(package_dir):
-                        if asset_dir in usr_asset_dirs:
-                            usr_asset_dirs.remove(asset_dir)
-            for d in usr_asset_dirs:
-                if os.path.isdir(d):
-                    thread = threading.Thread(target=watch, args=(d,), daemon=True)
-                    thread.start()
+            roots: list[str] = []
+            for d in sorted({*comets.dirs, *assets.dirs}):
+                if not os.path.isdir(d) or any(
+                    Path(d).is_relative_to(package_dir) for package_dir in package_dirs
+                ):
+                    continue
+                # a root inside another one is already watched
+                if not any(Path(d).is_relative_to(root) for root in roots):
+                    roots.append(d)
+            if roots:
+                watch(roots)
+
+
+def watch(roots: list[str]) -> None:
+    """
+    Watch every root with a single observer. Changed files are queued and
+    compiled in batches once they stay untouched for DEBOUNCE seconds.
+    """
+    from watchdog.events import FileSystemEvent, FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    class EventHandler(FileSystemEventHandler):
+        def __init__(self) -> None:
+            super().__init__()
+            self.pending: dict[str, None] = {}
+            self.last = 0.0
+            self.condition = threading.Condition()
+
+        def dispatch(self, event: FileSystemEvent) -> None:
+            if event.event_type in ["created", "deleted", "moved"]:
+                update_resolvers(event)
+                engines["picomet"].forget()
+            if event.is_directory or event.event_type in ["deleted", "opened"]:
+                return
+            path = event.dest_path if event.event_type == "moved" else event.src_path
+            with self.condition:
+                self.pending[str(path)] = None
+                self.last = time.monotonic()
+                self.condition.notify()
+
+        def work(self) -> None:
+            while True:
+                with self.condition:
+                    while not self.pending:
+                        self.condition.wait()
+                    while (wait := self.last + DEBOUNCE - time.monotonic()) > 0:
+                        self.condition.wait(wait)
+                    paths = list(self.pending)
+                    self.pending.clear()
+                changed: list[str] = []
+                for path in paths:
+                    try:
+                        if os.path.isfile(path) and is_file_changed(path):
+                            changed.append(path)
+                    except OSError:
+                        # removed since, like the temporary files of editors
+                        continue
+                try:
+                    compile_files(changed)
+                except Exception:
+                    traceback.print_exc()
+
+    event_handler = EventHandler()
+    observer = Observer()
+    observer.daemon = True
+    for root in roots:
+        observer.schedule(event_handler, root, recursive=True)
+    observer.start()
+    threading.Thread(target=event_handler.work, daemon=True).start()
+
+
+def update_resolvers(event: Any) -> None:
+    if event.is_directory:
+        comets.clear()
+        assets.clear()
+        return
+    for resolver in [comets, assets]:
+        if event.event_type == "created":
+            resolver.add(event.src_path)
+        elif event.event_type == "deleted":
+            resolver.remove(event.src_path)
+        else:
+            resolver.remove(event.src_path)
+            resolver.add(event.dest_path)
 
 
 def parse_patterns(url_patterns: list[URLResolver | URLPattern]) -> None:
+    with deferred_assets():
+        for template_name in route_templates(url_patterns):
+            parse_template(template_name)
+
+
+def route_templates(
+    url_patterns: list[URLResolver | URLPattern],
+) -> Iterator[str]:
     for url_pattern in url_patterns:
         if (
             isinstance(url_pattern, URLPattern)
             and isinstance(url_pattern.pattern, RoutePattern)
             and hasattr(url_pattern.callback, "template_name")
         ):
-            renderer: Renderer = get_template(
-                url_pattern.callback.template_name, using="picomet"
-            )
-            html_file = renderer.origin.name
-            with open(html_file) as f:
-                cache_file(html_file, f.read())
-            parse(fcache[html_file], html_file)
+            yield url_pattern.callback.template_name
         elif isinstance(url_pattern, URLResolver):
-            parse_patterns(
+            yield from route_templates(
                 getattr(
                     url_pattern.urlconf_name,
                     "urlpatterns",
@@ -160,187 +202,199 @@ def parse_patterns(url_patterns: list[URLResolver | URLPattern]) -> None:
             )
 
 
+def parse_template(template_name: str) -> None:
+    renderer: Renderer = get_template(template_name, using="picomet")
+    html_file = renderer.origin.name
+    with open(html_file) as f:
+        source = f.read()
+    cache_file(html_file, source)
+    parse(source, html_file)
+
+
+def warm_up() -> None:
+    """
+    Compile the comets of every route and their tailwind layouts in the
+    background of the lazy dev server, pausing between comets so that the
+    requests compiling their own go first.
+    """
+    if sys.platform == "linux":
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), WARMUP_NICENESS)
+    start = time.perf_counter()
+    template_names = list(dict.fromkeys(route_templates(get_resolver().url_patterns)))
+    for template_name in template_names:
+        time.sleep(WARMUP_PAUSE)
+        try:
+            parse_template(template_name)
+        except Exception:
+            traceback.print_exc()
+    for layout in list(twlayouts):
+        time.sleep(WARMUP_PAUSE)
+        try:
+            compile_layouts(layout)
+        except Exception:
+            traceback.print_exc()
+    store.set("meta", "warm", "1")
+    print(
+        f"Picomet: warmed up {len(template_names)} routes in "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+
+
 def is_file_changed(path: str) -> bool:
-    content = read_source(path)
-    cached = fhash.get(path)
-    if cached:
-        changed = mdhash(content, 8) != cached
-        cache_file(path, content)
-        return changed
+    content, hash = hash_source(path)
+    changed = fhash.get(path) != hash
+    if content is None:
+        cache_hash(path, hash)
     else:
         cache_file(path, content)
-        return True
+    return changed
+
+
+def compile_files(paths: list[str]) -> None:
+    """
+    Compile the changed files, components before their dependents, and send
+    their updates in a single HMR message. Every affected tailwind layout is
+    compiled once.
+    """
+    messages: list[dict[str, str]] = []
+    # the layouts to compile, and whether their content changed only
+    layouts: dict[str, bool] = {}
+    worker.timings.clear()
+    for path in dgraph.sort(paths):
+        _compile_file(path, messages, layouts)
+    for layout, incremental in sorted(layouts.items()):
+        if compile_tailwind(layout, incremental):
+            messages.append(
+                {"staticUrl": STATIC_URL, "tailwind": asset_cache[layout].fname}
+            )
+    for job in worker.timings:
+        print(f"Picomet: {job.method} {job.name} in {job.duration:.0f}ms")
+    if messages:
+        hmr_send_message({"batch": messages})
 
 
 def compile_file(path: str) -> None:
-    _, ext = os.path.splitext(path)
+    compile_files([path])
 
-    if (
-        ext == ".html"
-        and (cache_dir / "comets" / f"{get_comet_id(path)}.json").exists()
-    ):
-        parser = parse(fcache[path], path, use_cache=False)
 
-        dmap = deepcopy(dgraph)
-
-        def update_depended(p: str) -> None:
-            for d in dmap.get(p, []):
-                if not ast_cache.get(d):
-                    if os.path.exists(d):
-                        with open(d) as f:
-                            parse(f.read(), d, use_cache=False)
-                    else:
-                        continue
-                ast = ast_cache.get(d)
-                if ast:
-                    Mapper(ast, d)
-                update_depended(d)
-
-        update_depended(path)
-
-        if path in twlayouts.keys():
-            compile_tailwind(path)
-        else:
-            compiled = []
-
-            def compile_layout(f: str) -> None:
-                compile_tailwind(f)
-                compiled.append(f)
-                hmr_send_message(
-                    {
-                        "staticUrl": STATIC_URL,
-                        "tailwind": asset_cache[f][0],
-                    }
-                )
-
-            def find_depending_layout(f: str) -> None:
-                for d1 in dgraph:
-                    for d2 in dgraph[d1]:
-                        if d2 == f:
-                            if d1 in twlayouts.keys():
-                                if d1 not in compiled:
-                                    compile_layout(d1)
-                            else:
-                                find_depending_layout(d1)
-
-            def find_depended_layout(f: str) -> None:
-                for d in dgraph.get(f, []):
-                    if d in twlayouts.keys():
-                        if d not in compiled:
-                            compile_layout(d)
-                    else:
-                        find_depended_layout(d)
-                        find_depending_layout(d)
-
-            find_depended_layout(path)
-            find_depending_layout(path)
-
-        hmr_send_message({"base" if parser.ast.get("isBase") else "template": path})
-    elif (ext == ".js" or ext == ".ts") and len(dgraph.get(path, [])):
+def _compile_file(
+    path: str, messages: list[dict[str, str]], layouts: dict[str, bool]
+) -> None:
+    _, ext = os.path.splitext(path)
+    # found again from the new content by the parse, the compile or the next
+    # tailwind compile
+    candidates.pop(path, None)
+
+    if ext == ".html" and store.has("comet", path):
+        parser = parse(read_file(path), path, use_cache=False)
+        engines["picomet"].forget({path, *dgraph.all_dependents(path)})
+        messages.append({"base" if parser.ast.isBase else "template": path})
+    elif (ext == ".js" or ext == ".ts") and dgraph.get_dependents(path):
         compile_asset(path)
-        hmr_send_message(
-            {
-                "staticUrl": STATIC_URL,
-                "script": asset_cache[path][0],
-            }
-        )
-    elif (ext == ".css" or ext == ".scss") and len(dgraph.get(path, [])):
+        messages.append({"staticUrl": STATIC_URL, "script": asset_cache[path].fname})
+    elif (ext == ".css" or ext == ".scss") and dgraph.get_dependents(path):
         compile_asset(path)
-        hmr_send_message(
-            {
-                "staticUrl": STATIC_URL,
-                "style": asset_cache[path][0],
-            }
-        )
+        messages.append({"staticUrl": STATIC_URL, "style": asset_cache[path].fname})
     elif ext == ".css" and path.endswith(".tailwind.css"):
         for layout in twlayouts:
             if path == os.path.join(
                 os.path.dirname(layout),
                 f"{twlayouts[layout]}.tailwind.css",
             ):
-                compile_tailwind(layout)
-                hmr_send_message(
-                    {
-                        "staticUrl": STATIC_URL,
-                        "tailwind": asset_cache[layout][0],
-                    }
-                )
-    elif dgraph.get(path):
+                layouts[layout] = False
+    elif dgraph.get_dependents(path):
         compile_resouce(path)
-        hmr_send_message(
-            {
-                "staticUrl": STATIC_URL,
-                "link": asset_cache[path][0],
-            }
-        )
+        messages.append({"staticUrl": STATIC_URL, "link": asset_cache[path].fname})
+
+    # any content file of a layout may use new classes
+    related = dgraph.related(path)
+    for layout in twlayouts:
+        if layout in related:
+            layouts.setdefault(layout, True)
 
 
 def validate_cache() -> bool:
-    comets_dir = cache_dir / "comets"
-    maps_dir = cache_dir / "maps"
-    assets_dir = cache_dir / "assets"
-    for folder in [picomet_dir, cache_dir, comets_dir, maps_dir, assets_dir]:
+    for folder in [picomet_dir, cache_dir, cache_dir / "assets"]:
         if not folder.is_dir():
             return False
-
+    if not store.path.is_file():
+        return False
     try:
-        with (cache_dir / "picomet.json").open() as f:
-            picomet = loads(f.read())
-            if picomet["version"] != version("picomet"):
-                return False
-    except Exception:
+        return store.get("meta", "version") == version("picomet")
+    except sqlite3.Error:
         return False
 
-    assets_file = cache_dir / "assets.json"
-    dgraph_file = cache_dir / "dgraph.json"
-    fhash_file = cache_dir / "fhash.json"
-    for file in [assets_file, dgraph_file, fhash_file]:
-        if not file.is_file():
-            return False
-        else:
-            try:
-                with file.open() as f:
-                    loads(f.read())
-            except Exception:
-                return False
-    return True
-
 
 def reset_cache() -> None:
     if not picomet_dir.is_dir():
         picomet_dir.mkdir()
+    store.close()
     if cache_dir.is_dir():
         shutil.rmtree(cache_dir)
 
-    comets_dir = cache_dir / "comets"
-    maps_dir = cache_dir / "maps"
-    assets_dir = cache_dir / "assets"
-    for folder in [cache_dir, comets_dir, maps_dir, assets_dir]:
+    for folder in [cache_dir, cache_dir / "assets"]:
         folder.mkdir()
 
-    picomet_file = cache_dir / "picomet.json"
-    with picomet_file.open("w") as f:
-        f.write(dumps({"version": version("picomet")}))
+    store.set("meta", "version", version("picomet"))
+    store.flush()
 
-    for cache in [fcache, fhash, asset_cache, dgraph, twlayouts]:
+    for cache in [fcache, fhash, fstat, asset_cache, twlayouts]:
         if isinstance(cache, dict):
             cache.clear()
+    dgraph.clear()
+    interning.clear()
+
 
-    assets_file = cache_dir / "assets.json"
-    dgraph_file = cache_dir / "dgraph.json"
-    fhash_file = cache_dir / "fhash.json"
-    for file in [assets_file, dgraph_file, fhash_file]:
-        with file.open("w") as f:
-            f.write("{}")
+def hash_file(path: str) -> tuple[str, str | None, str]:
+    stat = get_fstat(path)
+    return stat, *hash_source(path)
 
 
 def validate_fhash() -> None:
-    for file in fhash:
-        if Path(file).exists():
-            content = read_source(file)
-            if mdhash(content, 8) != fhash[file]:
-                cache_file(file, content)
-                compile_file(file)
+    """
+    Compile the files edited while the server was down. Only the files whose
+    stat changed since they were hashed are read, in a thread pool.
+    """
+    start = time.perf_counter()
+    files: list[str] = []
+    stale: list[str] = []
+    for file in list(fhash):
+        try:
+            stat = get_fstat(file)
+        except OSError:
+            continue
+        files.append(file)
+        if fstat.get(file) != stat:
+            stale.append(file)
+
+    changed: list[str] = []
+    if stale:
+        print(f"Picomet: hashing {len(stale)} of {len(files)} cached files")
+        step = max(len(stale) // 4, 100)
+        with ThreadPoolExecutor() as executor:
+            futures = {executor.submit(hash_file, file): file for file in stale}
+            for done, future in enumerate(as_completed(futures), 1):
+                file = futures[future]
+                try:
+                    stat, content, digest = future.result()
+                except OSError:
+                    continue
+                if digest != fhash[file]:
+                    if content is None:
+                        cache_hash(file, digest, stat)
+                    else:
+                        cache_file(file, content, stat)
+                    changed.append(file)
+                else:
+                    save_fstat(file, stat)
+                if done % step == 0 and done < len(stale):
+                    print(f"Picomet: hashed {done}/{len(stale)} files")
+    print(
+        f"Picomet: validated {len(files)} cached files in "
+        f"{(time.perf_counter() - start) * 1000:.0f}ms, "
+        f"hashed {len(stale)}, {len(changed)} changed"
+    )
+    compile_files(changed)
 
 
 def hmr_send_message(message: dict) -> None:
@@ -0,0 +1,136 @@
+from collections.abc import Iterable, Iterator
+
+
+class DependencyGraph:
+    """
+    Edges from a component (comet, asset or resource) to the comets depending
+    on it, indexed both ways. Transitive closures are memoized until the next
+    edit and every traversal is safe against cycles.
+    """
+
+    __slots__ = ("dependents", "components", "_dependents", "_components")
+
+    def __init__(self, edges: dict[str, list[str]] | None = None):
+        self.dependents: dict[str, set[str]] = {}
+        self.components: dict[str, set[str]] = {}
+        self._dependents: dict[str, frozenset[str]] = {}
+        self._components: dict[str, frozenset[str]] = {}
+        for component, dependents in (edges or {}).items():
+            self.dependents.setdefault(component, set())
+            for dependent in dependents:
+                self.add(component, dependent)
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.dependents or path in self.components
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.dependents)
+
+    def invalidate(self) -> None:
+        self._dependents.clear()
+        self._components.clear()
+
+    def add(self, component: str, dependent: str) -> None:
+        dependents = self.dependents.setdefault(component, set())
+        if dependent not in dependents:
+            dependents.add(dependent)
+            self.components.setdefault(dependent, set()).add(component)
+            self.invalidate()
+
+    def remove_components(self, dependent: str) -> None:
+        """Remove the edges from every component of dependent."""
+        components = self.components.pop(dependent, None)
+        if components:
+            for component in components:
+                self.dependents[component].discard(dependent)
+            self.invalidate()
+
+    def clear(self) -> None:
+        self.dependents.clear()
+        self.components.clear()
+        self.invalidate()
+
+    def get_dependents(self, component: str) -> set[str]:
+        return self.dependents.get(component, set())
+
+    def get_components(self, dependent: str) -> set[str]:
+        return self.components.get(dependent, set())
+
+    def all_dependents(self, component: str) -> frozenset[str]:
+        """Everything depending on component, directly or not."""
+        return self.closure(component, self.dependents, self._dependents)
+
+    def all_components(self, dependent: str) -> frozenset[str]:
+        """Everything dependent depends on, directly or not."""
+        return self.closure(dependent, self.components, self._components)
+
+    def closure(
+        self,
+        path: str,
+        edges: dict[str, set[str]],
+        memo: dict[str, frozenset[str]],
+    ) -> frozenset[str]:
+        closure = memo.get(path)
+        if closure is None:
+            seen: set[str] = set()
+            stack = list(edges.get(path, ()))
+            while stack:
+                node = stack.pop()
+                if node not in seen:
+                    seen.add(node)
+                    known = memo.get(node)
+                    if known is not None:
+                        seen |= known
+                    else:
+                        stack.extend(edges.get(node, ()))
+            seen.discard(path)
+            closure = memo[path] = frozenset(seen)
+        return closure
+
+    def related(self, path: str) -> set[str]:
+        """
+        path, everything it depends on and everything depending on it along with
+        their own components. For a tailwind layout, these are its content files.
+        The relation is symmetric.
+        """
+        related = {path, *self.all_components(path)}
+        for dependent in self.all_dependents(path):
+            related.add(dependent)
+            related |= self.all_components(dependent)
+        return related
+
+    def sort(self, paths: Iterable[str]) -> list[str]:
+        """
+        Order paths so that components come before their dependents, even
+        through components that are not in paths.
+        """
+        paths = set(paths)
+        ordered: list[str] = []
+        visited: set[str] = set()
+        for path in sorted(paths):
+            if path in visited:
+                continue
+            visited.add(path)
+            stack = [(path, iter(sorted(self.all_components(path) & paths)))]
+            while stack:
+                node, components = stack[-1]
+                for component in components:
+                    if component not in visited:
+                        visited.add(component)
+                        stack.append(
+                            (
+                                component,
+                                iter(sorted(self.all_components(component) & paths)),
+                            )
+                        )
+                        break
+                else:
+                    stack.pop()
+                    ordered.append(node)
+        return ordered
+
+    def to_json(self) -> dict[str, list[str]]:
+        return {
+            component: sorted(dependents)
+            for component, dependents in self.dependents.items()
+        }
@@ -1,13 +1,11 @@
-import base64
 import os
 import re
-from itertools import chain
 from pathlib import Path
 
 from django.conf import settings
-from django.template import engines
 
-from picomet.utils import mdhash
+from picomet.resolver import comets
+from picomet.utils import file_hash, mdhash
 
 BASE_DIR: Path = settings.BASE_DIR
 
@@ -28,26 +26,16 @@ def get_url_id(url: str) -> str:
 
 
 def find_comet_name(path: str) -> str | None:
-    comet_dirs = list(
-        chain.from_iterable(
-            [
-                [str(d) for d in loader.get_dirs()]
-                for loader in engines["picomet"].engine.template_loaders
-            ]
-        )
-    )
-    for comet_dir in comet_dirs:
-        if path.startswith(comet_dir):
-            return path[len(comet_dir) + 1 :]
-    return None
-
-
-def read_source(path: str) -> str:
-    name, ext = os.path.splitext(path)
-    if ext in PLAINTEXT_FILES:
+    return comets.name(path)
+
+
+def hash_source(path: str) -> tuple[str | None, str]:
+    """
+    The content of a plain text file and its hash, binary files are hashed
+    without being kept in memory.
+    """
+    if os.path.splitext(path)[1] in PLAINTEXT_FILES:
         with open(path) as f:
             content = f.read()
-    else:
-        with open(path, "rb") as f:
-            content = base64.b64encode(f.read()).decode("utf-8")
-    return content
+        return content, mdhash(content, 8)
+    return None, file_hash(path)[:8]
@@ -0,0 +1,74 @@
+import sys
+from types import CodeType
+from typing import TYPE_CHECKING, Any, cast
+from weakref import WeakValueDictionary
+
+if TYPE_CHECKING:
+    from picomet.types import AstAttr
+
+# the strings and code objects are released once no ast uses them, attrs are
+# tuples that can't be weakly referenced and are dropped by clear
+strings: dict[type, WeakValueDictionary[str, Any]] = {}
+attrs: dict[tuple[str, type, Any], "AstAttr"] = {}
+codes: WeakValueDictionary[tuple[str, str], CodeType] = WeakValueDictionary()
+
+deduplicated = {"strings": 0, "attrs": 0, "codes": 0}
+
+
+def intern_str[T: str](string: T) -> T:
+    """
+    Share equal strings of the same type. Plain strings go through
+    ``sys.intern`` and are released once unused.
+    """
+    if type(string) is str:
+        interned = cast(T, sys.intern(string))
+    else:
+        pool = strings.setdefault(type(string), WeakValueDictionary())
+        # a plain copy as the key, the string itself would keep it alive
+        interned = pool.setdefault(str.__str__(string), string)
+    if interned is not string:
+        deduplicated["strings"] += 1
+    return interned
+
+
+def intern_attr(attr: "AstAttr") -> "AstAttr":
+    """
+    Share equal attrs without a value or with a string value. The type of the
+    value is part of the key as an escaped string equals a raw one.
+    """
+    key, val = attr
+    if val is not None and not isinstance(val, str):
+        return attr
+    pool_key = (key, type(val), val)
+    interned = attrs.get(pool_key)
+    if interned is None:
+        interned = attrs[pool_key] = type(attr)(
+            intern_str(key), None if val is None else intern_str(val)
+        )
+    else:
+        deduplicated["attrs"] += 1
+    return interned
+
+
+def intern_code(expression: str, filename: str) -> CodeType:
+    """
+    Compile an expression once for every use of it in the comet at filename,
+    so that its tracebacks point to the comet.
+    """
+    key = (filename, expression)
+    code = codes.get(key)
+    if code is None:
+        code = codes[key] = compile(expression, filename, "eval")
+    else:
+        deduplicated["codes"] += 1
+    return code
+
+
+def clear() -> None:
+    """Drop the shared attrs, the asts using them keep their own."""
+    attrs.clear()
+
+
+def stats() -> dict[str, int]:
+    """The number of objects shared instead of being created again."""
+    return dict(deduplicated)
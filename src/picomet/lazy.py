@@ -0,0 +1,52 @@
+from collections.abc import Callable
+from typing import Any
+
+from django.http import HttpRequest
+from django.utils.functional import SimpleLazyObject, empty
+
+type ContextProcessor = Callable[[HttpRequest], dict[str, Any]]
+
+
+def lazy(func: Callable[[], Any]) -> Any:
+    """
+    A context value computed on its first use during a render and kept, a
+    partial render not using it never computes it. It is a proxy, so
+    ``lazy(lambda: None) is None`` is False, compare its value with ``==``.
+    """
+    return SimpleLazyObject(func)
+
+
+def unlazy(value: Any) -> Any:
+    """The value of a lazy one, as the ``default`` of ``json.dumps``."""
+    if isinstance(value, SimpleLazyObject):
+        if value._wrapped is empty:
+            value._setup()
+        return value._wrapped
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def lazy_context(*names: str) -> Callable[[ContextProcessor], ContextProcessor]:
+    """
+    Register the names a context processor provides so that it only runs when
+    a render uses one of them.
+    """
+
+    def deco(processor: ContextProcessor) -> ContextProcessor:
+        processor.lazy_names = names  # type: ignore[attr-defined]
+        return processor
+
+    return deco
+
+
+def process_context(
+    processor: ContextProcessor, request: HttpRequest
+) -> dict[str, Any]:
+    names: tuple[str, ...] | None = getattr(processor, "lazy_names", None)
+    if names is None:
+        return processor(request)
+    context = lazy(lambda: processor(request))
+
+    def get(name: str) -> Any:
+        return lazy(lambda: context[name])
+
+    return {name: get(name) for name in names}
@@ -0,0 +1,245 @@
+import dis
+from collections import Counter
+from collections.abc import Iterator
+from types import CodeType
+from typing import Literal, NamedTuple
+
+from django.template.backends.django import Template
+from django.template.base import VariableNode
+
+from picomet.parser import ast_cache, find_component, get_spans, parse
+from picomet.types import AstElement, AstNode, Span, Spans, StrCode, isNodeElement
+from picomet.utils import get_atrb
+
+type Severity = Literal["error", "warning", "info"]
+
+QUERYSET_ATTRS = {
+    "all",
+    "filter",
+    "exclude",
+    "get",
+    "count",
+    "exists",
+    "first",
+    "last",
+    "aggregate",
+    "annotate",
+    "values",
+    "values_list",
+    "order_by",
+    "select_related",
+    "prefetch_related",
+    "latest",
+    "earliest",
+}
+
+# a mode="server" element with this many descendants is re-rendered on every
+# partial request targeting anything inside it
+SERVER_SUBTREE = 50
+REPEATED = 3
+
+
+class Issue(NamedTuple):
+    path: str
+    span: Span | None
+    severity: Severity
+    message: str
+
+    def __str__(self) -> str:
+        location = self.path
+        if self.span:
+            location += f":{self.span[0] + 1}:{self.span[1] + 1}"
+        return f"{location}: {self.severity}: {self.message}"
+
+
+def chains(code: CodeType) -> Iterator[tuple[str, ...]]:
+    """Attribute chains like ``blog.comment_set.count`` loaded by code."""
+    chain: list[str] = []
+    for instruction in dis.get_instructions(code):
+        if instruction.opname in ["LOAD_ATTR", "LOAD_METHOD"] and chain:
+            chain.append(str(instruction.argval))
+            continue
+        if len(chain) > 1:
+            yield tuple(chain)
+        chain = []
+        if instruction.opname in ["LOAD_NAME", "LOAD_GLOBAL", "LOAD_FAST"]:
+            chain.append(str(instruction.argval))
+    if len(chain) > 1:
+        yield tuple(chain)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            yield from chains(const)
+
+
+def template_chains(template: Template) -> Iterator[tuple[str, ...]]:
+    for node in template.template.nodelist.get_nodes_by_type(VariableNode):
+        var = node.filter_expression.var
+        lookups = getattr(var, "lookups", None)
+        if lookups and len(lookups) > 1:
+            yield tuple(lookups)
+
+
+def is_query(chain: tuple[str, ...]) -> bool:
+    return any(
+        attr == "objects" or attr.endswith("_set") or attr in QUERYSET_ATTRS
+        for attr in chain[1:]
+    )
+
+
+def count_elements(node: AstElement) -> int:
+    count = 0
+    for child in getattr(node, "children", []):
+        if isNodeElement(child):
+            count += 1 + count_elements(child)
+    return count
+
+
+class Linter:
+    """
+    Walk the ast of a comet and the components it includes, looking for
+    patterns that are costly to render.
+    """
+
+    def __init__(self) -> None:
+        self.issues: list[Issue] = []
+        self.reported: set[tuple[str, Span | None, str]] = set()
+        self.visited: set[tuple[str, bool]] = set()
+        self.path = ""
+        self.spans: Spans = []
+        self.expressions: Counter[str] = Counter()
+        self.includes: Counter[str] = Counter()
+
+    def lint(self, path: str, looped: bool = False) -> None:
+        if (path, looped) in self.visited:
+            return
+        self.visited.add((path, looped))
+        ast = ast_cache.get(path)
+        if ast is None:
+            with open(path) as f:
+                ast = parse(f.read(), path).ast
+        self.path = path
+        self.spans = get_spans(path) or []
+        self.expressions = Counter()
+        self.includes = Counter()
+        self.walk(ast, ast, 1 if looped else 0)
+        for expression, count in self.expressions.items():
+            if count >= REPEATED:
+                self.report(
+                    path,
+                    None,
+                    "info",
+                    f"'{expression}' is evaluated {count} times, "
+                    "compute it once with <With>",
+                )
+        for component, count in self.includes.items():
+            if count >= REPEATED:
+                self.report(
+                    path,
+                    None,
+                    "info",
+                    f"{component} is included {count} times",
+                )
+
+    def report(
+        self, path: str, span: Span | None, severity: Severity, message: str
+    ) -> None:
+        if (path, span, message) not in self.reported:
+            self.reported.add((path, span, message))
+            self.issues.append(Issue(path, span, severity, message))
+
+    def span(self, element: AstElement, attr: str | None = None) -> Span | None:
+        if 0 <= element.index < len(self.spans):
+            span, attrs = self.spans[element.index]
+            return attrs.get(attr, span) if attr else span
+        return None
+
+    def walk(self, node: AstNode, element: AstElement, loops: int) -> None:
+        if isinstance(node, StrCode):
+            self.expression(node, element, None, loops)
+        elif isinstance(node, Template):
+            for chain in template_chains(node):
+                if loops and is_query(chain):
+                    self.report(
+                        self.path,
+                        self.span(element),
+                        "error",
+                        f"'{'.'.join(chain)}' queries the database in a loop",
+                    )
+        elif isNodeElement(node):
+            self.element(node, loops)
+
+    def element(self, node: AstElement, loops: int) -> None:
+        for k, v in node.attrs:
+            if not isinstance(v, StrCode):
+                continue
+            if k == "s-of":
+                if any(is_query(chain) for chain in chains(v.code)):
+                    self.report(
+                        self.path,
+                        self.span(node, k),
+                        "warning",
+                        f"s-of '{v.string}' runs a query for every key",
+                    )
+            else:
+                self.expression(v, node, k, loops)
+        if node.tag in ["Layout", "Include"]:
+            at = get_atrb(node, "@")
+            if isinstance(at, str):
+                self.include(node, at, loops)
+        if get_atrb(node, "mode") == "server":
+            count = count_elements(node)
+            if count >= SERVER_SUBTREE:
+                self.report(
+                    self.path,
+                    self.span(node),
+                    "warning",
+                    f'mode="server" renders {count} elements on the server, '
+                    "narrow it to the parts that need it",
+                )
+        if get_atrb(node, "s-for"):
+            loops += 1
+        for child in getattr(node, "children", []):
+            self.walk(child, node, loops)
+
+    def expression(
+        self, code: StrCode, element: AstElement, attr: str | None, loops: int
+    ) -> None:
+        # looking up a bare name is as cheap as reading a <With> variable
+        if not code.string.strip().isidentifier():
+            self.expressions[code.string.strip()] += 1
+        if attr == "s-key":
+            loops += 1
+        if loops:
+            for chain in chains(code.code):
+                if is_query(chain):
+                    self.report(
+                        self.path,
+                        self.span(element, attr),
+                        "error",
+                        f"s-in '{code.string}' queries the database in a loop"
+                        if attr == "s-in"
+                        else f"'{'.'.join(chain)}' queries the database in a loop",
+                    )
+
+    def include(self, node: AstElement, name: str, loops: int) -> None:
+        component = find_component(name)
+        if node.tag == "Include":
+            self.includes[name] += 1
+            if loops:
+                self.report(
+                    self.path,
+                    self.span(node),
+                    "warning",
+                    f"{name} is included in a loop, "
+                    "it is rendered once per iteration",
+                )
+        state = (self.path, self.spans, self.expressions, self.includes)
+        self.lint(component, looped=bool(loops))
+        self.path, self.spans, self.expressions, self.includes = state
+
+
+def lint(paths: list[str]) -> list[Issue]:
+    linter = Linter()
+    for path in sorted(paths):
+        linter.lint(path)
+    return linter.issues
@@ -1,6 +1,5 @@
 import sys
 from collections.abc import Iterable
-from json import dumps, loads
 from pathlib import Path
 from typing import override
 
@@ -13,30 +12,60 @@ from django.template.utils import get_app_template_dirs
 from django.utils._os import safe_join
 
 from picomet.backends.picomet import Template
-from picomet.utils import mdhash
+from picomet.lru import LRUCache
+from picomet.parser import READONLY, budget
+from picomet.store import store
+from picomet.utils import get_fstat, mdhash
 
 TEST = len(sys.argv) > 1 and sys.argv[1] == "test"
 
 BASE_DIR: Path = settings.BASE_DIR
 
-cache_dir = BASE_DIR / ".picomet/cache"
-
-fcache: dict[str, str] = {}
+fcache: LRUCache[str] = LRUCache(budget)
 fhash: dict[str, str] = {}
+# the stat of every hashed file when it was hashed
+fstat: dict[str, str] = {}
 if len(sys.argv) > 1 and sys.argv[1] == "runserver":
-    try:
-        with open(cache_dir / "fhash.json") as f:
-            fhash = loads(f.read())
-    except FileNotFoundError:
-        pass
+    fhash = dict(store.load()["fhash"])
+    fstat = dict(store.load()["fstat"])
 
 
-def cache_file(path: str, content: str) -> None:
+def cache_file(path: str, content: str, stat: str | None = None) -> None:
+    """
+    Cache the content of path, stat is the one taken before reading it when
+    the caller has it.
+    """
     fcache[path] = content
-    if len(sys.argv) <= 1 or sys.argv[1] != "build":
-        fhash[path] = mdhash(fcache[path], 8)
-        with open(cache_dir / "fhash.json", "w") as f:
-            f.write(dumps(fhash))
+    cache_hash(path, mdhash(content, 8), stat)
+
+
+def read_file(path: str) -> str:
+    """
+    The content of path, read again when the budget evicted it since it was
+    cached.
+    """
+    content = fcache.get(path)
+    if content is None:
+        with open(path) as f:
+            content = f.read()
+        cache_file(path, content)
+    return content
+
+
+def cache_hash(path: str, hash: str, stat: str | None = None) -> None:
+    """Record the hash of path, binary files are only hashed."""
+    if (len(sys.argv) <= 1 or sys.argv[1] != "build") and not READONLY:
+        fhash[path] = hash
+        store.set("fhash", path, hash)
+        save_fstat(path, stat)
+
+
+def save_fstat(path: str, stat: str | None = None) -> None:
+    try:
+        fstat[path] = stat or get_fstat(path)
+    except OSError:
+        fstat.pop(path, None)
+    store.set("fstat", path, fstat.get(path))
 
 
 class BaseLoader(Loader):
@@ -90,8 +119,9 @@ class FilesystemLoader(BaseLoader):
                 ).exists():
                     return ""
                 with open(origin.name, encoding=self.engine.file_charset) as fp:
-                    cache_file(origin.name, fp.read())
-                    return fcache[origin.name]
+                    content = fp.read()
+                cache_file(origin.name, content)
+                return content
             return cached
         except FileNotFoundError:
             raise TemplateDoesNotExist(origin)
@@ -0,0 +1,165 @@
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterator, MutableMapping
+from typing import Any
+
+
+def sizeof(obj: Any) -> int:
+    """Estimate the memory held by obj and everything it references."""
+    size = 0
+    seen: set[int] = set()
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        if isinstance(item, str):
+            continue
+        elif isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, list | tuple | set | frozenset):
+            stack.extend(item)
+        else:
+            # the slots of the bases are listed on their own classes
+            for cls in type(item).__mro__:
+                slots = cls.__dict__.get("__slots__", ())
+                for slot in (slots,) if isinstance(slots, str) else slots:
+                    stack.append(getattr(item, slot, None))
+    return size
+
+
+class Budget:
+    """
+    A memory budget shared by LRU caches. Once the entries of the caches go
+    over limit bytes, the least recently used ones that are not pinned are
+    evicted.
+    """
+
+    def __init__(self, limit: int, pinned: Callable[[str], bool] = lambda key: False):
+        self.limit = limit
+        self.pinned = pinned
+        self.used = 0
+        self.order: OrderedDict[tuple[LRUCache, str], int] = OrderedDict()
+        self.lock = threading.RLock()
+
+    def touch(self, cache: "LRUCache", key: str) -> None:
+        with self.lock:
+            if (cache, key) in self.order:
+                self.order.move_to_end((cache, key))
+
+    def add(self, cache: "LRUCache", key: str, size: int) -> None:
+        with self.lock:
+            self.used += size - self.order.pop((cache, key), 0)
+            self.order[(cache, key)] = size
+            if self.used > self.limit:
+                self.evict(key)
+
+    def discard(self, cache: "LRUCache", key: str) -> None:
+        with self.lock:
+            self.used -= self.order.pop((cache, key), 0)
+
+    def evict(self, keep: str) -> None:
+        """Evict down to the limit, keeping the entries of every cache for keep."""
+        evicted: list[tuple[LRUCache, str]] = []
+        used = self.used
+        for entry in self.order:
+            if used <= self.limit:
+                break
+            if entry[1] != keep and not self.pinned(entry[1]):
+                evicted.append(entry)
+                used -= self.order[entry]
+        for entry in evicted:
+            self.used -= self.order.pop(entry)
+            cache, key = entry
+            cache.evict(key)
+
+
+class LRUCache[V](MutableMapping[str, V]):
+    """
+    A dict counting its hits and misses. With a budget, its entries are sized
+    on insert and the least recently used ones are evicted to stay within it.
+    """
+
+    def __init__(self, budget: Budget | None = None):
+        self.data: dict[str, V] = {}
+        self.budget = budget
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getitem__(self, key: str) -> V:
+        try:
+            value = self.data[key]
+        except KeyError:
+            self.misses += 1
+            raise
+        self.hits += 1
+        if self.budget is not None:
+            self.budget.touch(self, key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """A lookup counted once, without raising on a miss."""
+        value = self.data.get(key, default)
+        if key in self.data:
+            self.hits += 1
+            if self.budget is not None:
+                self.budget.touch(self, key)
+        else:
+            self.misses += 1
+        return value
+
+    def pop(self, key: str, *default: Any) -> Any:
+        """Remove key without counting it as a lookup."""
+        if key not in self.data:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self.data[key]
+        del self[key]
+        return value
+
+    def __setitem__(self, key: str, value: V) -> None:
+        self.data[key] = value
+        if self.budget is not None:
+            self.budget.add(self, key, sizeof(value))
+
+    def __delitem__(self, key: str) -> None:
+        del self.data[key]
+        if self.budget is not None:
+            self.budget.discard(self, key)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.data
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __eq__(self, other: object) -> bool:
+        return self is other
+
+    def __hash__(self) -> int:
+        return id(self)
+
+    def evict(self, key: str) -> None:
+        self.data.pop(key, None)
+        self.evictions += 1
+
+    def clear(self) -> None:
+        for key in list(self.data):
+            del self[key]
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self.data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
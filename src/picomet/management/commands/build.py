@@ -6,12 +6,24 @@ from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.urls import get_resolver
 
+from picomet import interning
 from picomet.compiler import parse_patterns
-from picomet.parser import ast_cache, compile_tailwind, save_commet, twlayouts
+from picomet.lint import lint
+from picomet.parser import (
+    ast_cache,
+    compile_tailwind,
+    save_assets,
+    save_commet,
+    twlayouts,
+)
 
 BASE_DIR: Path = settings.BASE_DIR
 
 
+def dir_size(*dirs: Path) -> int:
+    return sum(f.stat().st_size for d in dirs if d.is_dir() for f in d.iterdir())
+
+
 class Command(BaseCommand):
     help = "Build picomet for production"
 
@@ -23,6 +35,13 @@ class Command(BaseCommand):
             dest="verbose",
             help="Verbose mode",
         )
+        parser.add_argument(
+            "--lint",
+            action="store_true",
+            default=False,
+            dest="lint",
+            help="Report template patterns that are expensive to render",
+        )
 
     def handle(self, *args: list[Any], **options: dict[str, Any]) -> None:
         start = timeit.default_timer()
@@ -46,12 +65,21 @@ class Command(BaseCommand):
 
         for layout in twlayouts:
             compile_tailwind(layout)
-            save_commet(layout, ast_cache[layout], build_comets_dir)
+            save_commet(layout, ast_cache[layout])
+        save_assets()
+
+        if options["lint"]:
+            for issue in lint(list(ast_cache)):
+                self.stdout.write(str(issue))
 
         self.stdout.write(f"✓ built in {round(timeit.default_timer() - start, 2)}s")
         if options["verbose"]:
             self.stdout.write(f"✓ location: {build_dir}")
             comets = len(list(build_comets_dir.glob("*")))
             self.stdout.write(f"✓ comets: {comets}")
+            size = dir_size(build_comets_dir, build_maps_dir)
+            self.stdout.write(f"✓ comets and maps: {size / 1024:.1f} KB")
             assets = len(list(build_assets_dir.glob("*")))
             self.stdout.write(f"✓ assets: {assets}")
+            shared = ", ".join(f"{n} {k}" for k, n in interning.stats().items())
+            self.stdout.write(f"✓ interned: {shared}")
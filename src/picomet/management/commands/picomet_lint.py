@@ -0,0 +1,23 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import get_resolver
+
+from picomet.compiler import parse_patterns
+from picomet.lint import lint
+from picomet.parser import ast_cache
+
+
+class Command(BaseCommand):
+    help = "Flag template patterns that are expensive to render"
+
+    def handle(self, *args: list[Any], **options: dict[str, Any]) -> None:
+        parse_patterns(get_resolver().url_patterns)
+
+        issues = lint(list(ast_cache))
+        for issue in issues:
+            self.stdout.write(str(issue))
+        errors = sum(issue.severity == "error" for issue in issues)
+        self.stdout.write(f"{len(issues)} issues, {errors} errors")
+        if errors:
+            raise CommandError("expensive template patterns found")
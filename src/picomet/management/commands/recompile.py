@@ -16,6 +16,9 @@ class Command(BaseCommand):
 
     def handle(self, *args: list[Any], **options: dict[str, Any]) -> None:
         reset_cache()
+        # the lazy dev server compiles the comets as they are requested
+        if getattr(settings, "PICOMET_LAZY_COMPILE", False):
+            return
 
         parse_patterns(get_resolver().url_patterns)
 
@@ -1,10 +1,13 @@
 from collections.abc import Callable
 from json import loads
 
-from django.http import HttpRequest, HttpResponse
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse
 
 from picomet import call_action
 from picomet.http import PicometResponseRedirect
+from picomet.needs import RequestNeeds
+from picomet.queries import capture_queries
 from picomet.shortcuts import ActionRedirect
 
 
@@ -15,6 +18,7 @@ class CommonMiddleware:
     def __call__(self, request: HttpRequest) -> HttpResponse:
         request.targets = loads(request.headers.get("Targets", "[]"))
         request.action = request.headers.get("Action")
+        request.picomet = RequestNeeds(request)
 
         try:
             if request.method != "GET":
@@ -22,6 +26,14 @@ class CommonMiddleware:
         except ActionRedirect as e:
             return PicometResponseRedirect(request, e.args[0], e.args[1])
 
+        if settings.DEBUG and getattr(settings, "PICOMET_QUERY_REPORT", False):
+            with capture_queries() as report:
+                response = self.get_response(request)
+            if "Picomet-Queries" in request.headers:
+                return JsonResponse(report.to_json())
+            response["Picomet-Queries"] = report.summary()
+            return response
+
         response = self.get_response(request)
 
         return response
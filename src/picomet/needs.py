@@ -0,0 +1,219 @@
+import dis
+from collections.abc import Iterable
+from types import CodeType
+from typing import Any
+
+from django.http import HttpRequest
+from django.template import loader
+from django.template.backends.django import Template
+from django.template.base import TextNode, VariableNode
+
+from picomet.types import Ast, AstElement, StrCode, isNodeElement, isNodeWithChildren
+from picomet.utils import get_atrb
+
+# the names of a subtree are unknown, it may read anything
+ANY = "*"
+
+type Needs = dict[str, frozenset[str]]
+
+# the needs of a comet and the asts they were computed from
+needs_cache: dict[str, tuple[list[tuple[str, Ast]], Needs]] = {}
+
+
+def code_names(code: CodeType) -> set[str]:
+    """The names code looks up in the context."""
+    names: set[str] = set()
+    for instruction in dis.get_instructions(code):
+        if instruction.opname in ["LOAD_NAME", "LOAD_GLOBAL"]:
+            names.add(str(instruction.argval))
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= code_names(const)
+    return names
+
+
+def template_names(template: Template) -> set[str]:
+    names: set[str] = set()
+    for node in template.template.nodelist:
+        if isinstance(node, VariableNode):
+            expression = node.filter_expression
+            variables = [expression.var]
+            # the arguments of the filters, the literal ones are not looked up
+            for _, args in expression.filters:
+                variables += [arg for lookup, arg in args if lookup]
+            for var in variables:
+                lookups = getattr(var, "lookups", None)
+                if lookups:
+                    names.add(lookups[0])
+        elif not isinstance(node, TextNode):
+            # tags resolve their arguments their own way
+            return {ANY}
+    return names
+
+
+def get_comet(name: str) -> tuple[str, Ast]:
+    if not name.endswith(".html"):
+        name = f"{name}.html"
+    template = loader.get_template(name, using="picomet").template
+    return str(template.origin.name), template.bind()[0]
+
+
+class Analyzer:
+    """
+    Collect the context names read when rendering each group, param, layout
+    and file target of a comet: the names of its subtree, with the components
+    it includes and the children passed to them, and the names of the
+    attributes of its ancestors.
+    """
+
+    def __init__(self) -> None:
+        self.needs: dict[str, set[str]] = {}
+        self.asts: list[tuple[str, Ast]] = []
+        self.stack: list[str] = []
+        # the names of the children passed to the comets being visited, read
+        # by their Children and Outlet
+        self.children: list[frozenset[str]] = []
+        # every target in the order it was recorded
+        self.recorded: list[str] = []
+
+    def comet(
+        self,
+        name: str,
+        ancestors: frozenset[str],
+        children: frozenset[str] = frozenset(),
+    ) -> set[str]:
+        path, ast = get_comet(name)
+        if path in self.stack:
+            return set()
+        self.stack.append(path)
+        self.asts.append((name, ast))
+        self.children.append(children)
+        names = self.visit(ast, ancestors)
+        self.children.pop()
+        self.stack.pop()
+        return names
+
+    def visit(self, node: AstElement, ancestors: frozenset[str]) -> set[str]:
+        names: set[str] = set()
+        for _, v in node.attrs:
+            if isinstance(v, StrCode):
+                names |= code_names(v.code)
+        inner = ancestors | names
+        at = get_atrb(node, "@")
+        if node.tag in ["Layout", "Include"] and isinstance(at, str):
+            start = len(self.recorded)
+            children = self.visit_children(node, inner)
+            included = self.comet(at, inner, frozenset(children))
+            names |= children | included
+            # the children are rendered inside the component
+            for target in self.recorded[start:]:
+                self.needs[target] |= included
+        else:
+            if node.tag == "Children" and self.children:
+                names |= self.children[-1]
+            names |= self.visit_children(node, inner)
+        for target in self.targets(node):
+            self.needs.setdefault(target, set()).update(ancestors, names)
+            self.recorded.append(target)
+        return names
+
+    def visit_children(self, node: AstElement, ancestors: frozenset[str]) -> set[str]:
+        names: set[str] = set()
+        if isNodeWithChildren(node):
+            for child in node.children:
+                if isNodeElement(child):
+                    names |= self.visit(child, ancestors)
+                elif isinstance(child, StrCode):
+                    names |= code_names(child.code)
+                elif isinstance(child, Template):
+                    names |= template_names(child)
+        return names
+
+    def targets(self, node: AstElement) -> Iterable[str]:
+        for attr, prefix in [("s-group", "&"), ("s-param", "?")]:
+            value = get_atrb(node, attr)
+            if isinstance(value, str):
+                for id in value.split(","):
+                    yield f"{prefix}{id}"
+        layout = get_atrb(node, "layout")
+        if node.tag == "Outlet" and isinstance(layout, str):
+            yield f"+{layout}"
+        if isNodeWithChildren(node) and node.file:
+            yield f"${node.file}"
+
+
+def get_needs(name: str) -> Needs:
+    """
+    The context names read by each target of the comet named name, computed
+    again once the comet or one of its components is parsed again.
+    """
+    cached = needs_cache.get(name)
+    if cached is not None:
+        asts, needs = cached
+        if all(get_comet(comet)[1] is ast for comet, ast in asts):
+            return needs
+    analyzer = Analyzer()
+    analyzer.comet(name, frozenset())
+    needs = {target: frozenset(names) for target, names in analyzer.needs.items()}
+    needs_cache[name] = (analyzer.asts, needs)
+    return needs
+
+
+def needs(name: str, targets: list[str], *names: str) -> bool:
+    """
+    Whether rendering targets of the comet named name may read one of names,
+    a full render reads everything.
+    """
+    if not targets:
+        return True
+    comet_needs = get_needs(name)
+    for target in targets:
+        needed = comet_needs.get(target)
+        if needed is None or ANY in needed or any(n in needed for n in names):
+            return True
+    return False
+
+
+class RequestNeeds:
+    """``request.picomet``, telling views which context the targets use."""
+
+    def __init__(self, request: HttpRequest):
+        self.request = request
+
+    def needs(self, *names: str) -> bool:
+        template_name = getattr(self.request, "template_name", None)
+        if template_name is None:
+            return True
+        return needs(template_name, self.request.targets, *names)
+
+
+class RecordingContext(dict[str, Any]):
+    """A context recording the names the expressions evaluated in it read."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.read: set[str] = set()
+
+    def __getitem__(self, key: str) -> Any:
+        self.read.add(key)
+        return super().__getitem__(key)
+
+
+def assert_needs_conservative(
+    name: str,
+    context: dict[str, Any],
+    targets: list[str],
+    keys: list[tuple[str, int]] | None = None,
+) -> None:
+    """
+    Render targets of the comet named name and fail if it read a context name
+    the analysis doesn't list for them.
+    """
+    recording = RecordingContext(context)
+    template = loader.get_template(name, using="picomet").template
+    template.render(recording, targets, keys or [])
+    missing = sorted(n for n in recording.read if not needs(name, targets, n))
+    if missing:
+        raise AssertionError(
+            f"rendering {', '.join(targets)} of {name} read {', '.join(missing)}"
+        )
@@ -0,0 +1,143 @@
+import atexit
+import json
+import os
+import subprocess
+import sys
+import threading
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from django.conf import settings
+
+BASE_DIR: Path = settings.BASE_DIR
+
+
+class NodeError(Exception):
+    pass
+
+
+class Job(NamedTuple):
+    method: str
+    name: str
+    # milliseconds spent in node
+    duration: float
+
+
+class NodeWorker:
+    """
+    A node process compiling typescript, sass and tailwind, started on the
+    first job and kept running so that the compilers stay loaded. Jobs are
+    sent as JSON lines, run concurrently and answered as they finish.
+    """
+
+    def __init__(self, script: Path, cwd: Path):
+        self.script = script
+        self.cwd = cwd
+        self.lock = threading.Lock()
+        self.process: subprocess.Popen[str] | None = None
+        self.futures: dict[int, tuple[str, str, Future[Any]]] = {}
+        self.id = 0
+        # the timings of the latest jobs
+        self.timings: deque[Job] = deque(maxlen=100)
+        atexit.register(self.close)
+
+    def start(self) -> subprocess.Popen[str]:
+        env = os.environ.copy()
+        node_path = [str(self.cwd / "node_modules")]
+        if env.get("NODE_PATH"):
+            node_path.append(env["NODE_PATH"])
+        env["NODE_PATH"] = os.pathsep.join(node_path)
+        process = subprocess.Popen(
+            ["node", str(self.script)],
+            cwd=self.cwd,
+            env=env,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        threading.Thread(target=self.read, args=(process,), daemon=True).start()
+        return process
+
+    def read(self, process: subprocess.Popen[str]) -> None:
+        assert process.stdout is not None
+        try:
+            for line in process.stdout:
+                try:
+                    response = json.loads(line)
+                    id = response["id"]
+                except (ValueError, TypeError, KeyError):
+                    # printed by a dependency, not a response
+                    sys.stderr.write(line)
+                    continue
+                with self.lock:
+                    job = self.futures.pop(id, None)
+                if job is None:
+                    # failed when the worker was thought to have exited
+                    continue
+                method, name, future = job
+                if "error" in response:
+                    future.set_exception(NodeError(response["error"]))
+                else:
+                    self.timings.append(Job(method, name, response.get("ms", 0)))
+                    future.set_result(response.get("result"))
+        finally:
+            with self.lock:
+                if self.process is process:
+                    self.process = None
+                    self.fail()
+                    # no response of it would be read anymore
+                    if process.poll() is None:
+                        process.kill()
+
+    def fail(self) -> None:
+        """Fail the jobs of a worker that exited, they are never answered."""
+        futures, self.futures = self.futures, {}
+        for _, _, future in futures.values():
+            future.set_exception(NodeError("the node worker exited"))
+
+    def batch(self, jobs: list[tuple[str, str, dict[str, Any]]]) -> list[Future[Any]]:
+        """
+        Send jobs of ``(method, name, params)`` at once, name identifies the
+        job in the timings.
+        """
+        futures: list[Future[Any]] = []
+        lines: list[str] = []
+        with self.lock:
+            if self.process is None or self.process.poll() is not None:
+                self.fail()
+                self.process = self.start()
+            for method, name, params in jobs:
+                self.id += 1
+                future: Future[Any] = Future()
+                self.futures[self.id] = (method, name, future)
+                futures.append(future)
+                request = {"id": self.id, "method": method, "params": params}
+                lines.append(json.dumps(request) + "\n")
+            assert self.process.stdin is not None
+            self.process.stdin.write("".join(lines))
+            self.process.stdin.flush()
+        return futures
+
+    def submit(self, method: str, name: str, params: dict[str, Any]) -> Future[Any]:
+        return self.batch([(method, name, params)])[0]
+
+    def call(self, method: str, name: str, params: dict[str, Any]) -> Any:
+        return self.submit(method, name, params).result()
+
+    def close(self) -> None:
+        with self.lock:
+            process, self.process = self.process, None
+        if process is not None and process.poll() is None:
+            assert process.stdin is not None
+            process.stdin.close()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+worker = NodeWorker(Path(__file__).parent / "worker.js", BASE_DIR)
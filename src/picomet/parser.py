@@ -1,21 +1,21 @@
-import base64
 import os
 import re
 import sys
-from copy import deepcopy
-from functools import cache
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import cache, lru_cache
 from glob import glob
-from itertools import chain
 from json import JSONEncoder, dumps, loads
 from pathlib import Path
 from typing import Any, Literal, cast
 
 from django.apps import apps
 from django.conf import settings
-from django.template import engines, loader
+from django.template import TemplateSyntaxError, engines, loader
 from django.template.backends.django import Template
 from django.utils.html import escape
-from htmst import HtmlAst
 from htmst.structures import (
     AttrNode,
     CommentNode,
@@ -25,17 +25,31 @@ from htmst.structures import (
     TextNode,
 )
 
-from picomet.helpers import find_comet_name, get_comet_id
+from picomet.compiled import compile_cached, link_blob, sass_imports, save_blob
+from picomet.graph import DependencyGraph
+from picomet.helpers import PLAINTEXT_FILES, find_comet_name, get_comet_id
+from picomet.interning import intern_str
+from picomet.lru import Budget, LRUCache
+from picomet.node import worker
+from picomet.resolver import assets, comets
+from picomet.scanner import get_position, scan
+from picomet.store import store
 from picomet.types import (
+    Asset,
+    AssetUrl,
     Ast,
     AstAttr,
     AstAttrs,
     AstElement,
     AstMap,
+    AstSubMap,
     ElementDoubleTag,
     ElementSingleTag,
+    Loc,
     PureAttrs,
+    Spans,
     StrCode,
+    SubLoc,
     Undefined,
     UndefinedType,
     isNodeElement,
@@ -43,21 +57,32 @@ from picomet.types import (
 )
 from picomet.types import DoubleQuoteEscapedStr as DQES
 from picomet.utils import escape_double_quote as edq
-from picomet.utils import get_atrb, get_span, mdhash
+from picomet.utils import file_hash, get_atrb, get_span, mdhash
 
 ltrim_re = re.compile(r"^(\s|\n|\t)+")
 rtrim_re = re.compile(r"(\s|\n|\t)+$")
+# the tokens tailwind may read as classes, a superset of the ones it matches
+candidate_re = re.compile(r"[^<>\"'`\s]*[^<>\"'`\s:]")
 
 BUILD = len(sys.argv) > 1 and sys.argv[1] == "build"
 COLLECTSTATIC = len(sys.argv) > 1 and sys.argv[1] == "collectstatic"
 RUNSERVER = len(sys.argv) > 1 and sys.argv[1] == "runserver"
 TEST = len(sys.argv) > 1 and sys.argv[1] == "test"
 RECOMPILE = len(sys.argv) > 1 and sys.argv[1] == "recompile"
+LINT = len(sys.argv) > 1 and (
+    sys.argv[1] == "picomet_lint" or (BUILD and "--lint" in sys.argv)
+)
 
-DEBUG: bool = settings.DEBUG
+# the build command turns DEBUG off only after this module is imported
+DEBUG: bool = settings.DEBUG and not BUILD
+# the dev server compiles comets, assets and tailwind layouts on first use
+LAZY: bool = RUNSERVER and DEBUG and getattr(settings, "PICOMET_LAZY_COMPILE", False)
+# the linter reports the spans of the elements it flags
+SPANS: bool = DEBUG or LINT
+# the linter parses in memory, leaving the dev cache and the assets untouched
+READONLY: bool = LINT and not BUILD
 BASE_DIR: Path = settings.BASE_DIR
 STATIC_URL = getattr(settings, "STATIC_URL", "/static/")
-ASSETFILES_DIRS = getattr(settings, "ASSETFILES_DIRS", [])
 django_engine = engines["django"]
 
 picomet_dir = BASE_DIR / ".picomet"
@@ -65,190 +90,293 @@ cache_dir = picomet_dir / "cache"
 build_dir = picomet_dir / "build"
 assets_dir = (build_dir if (TEST | BUILD | COLLECTSTATIC) else cache_dir) / "assets"
 
-ast_cache: dict[str, Ast] = {}
+# layouts and the components they include are never evicted
+pinned: set[str] = set()
 
-map_cache: dict[str, AstMap] = {}
+CACHE_BUDGET: int | None = getattr(settings, "PICOMET_CACHE_BUDGET", None)
+budget = (
+    Budget(CACHE_BUDGET, pinned.__contains__)
+    if CACHE_BUDGET and not (BUILD | RECOMPILE | LINT)
+    else None
+)
 
-asset_cache: dict[str, tuple[str, str]] = {}
-if not (BUILD | RECOMPILE):
-    try:
-        with (
-            picomet_dir / ("cache" if RUNSERVER else "build") / "assets.json"
-        ).open() as f:
-            asset_cache = loads(f.read())
-    except FileNotFoundError:
-        pass
+ast_cache: LRUCache[Ast] = LRUCache(budget)
 
-dgraph: dict[str, list[str]] = {}
-if RUNSERVER:
-    try:
-        with (cache_dir / "dgraph.json").open() as f:
-            dgraph = loads(f.read())
-    except FileNotFoundError:
-        pass
+map_cache: LRUCache[AstMap] = LRUCache(budget)
+
+submap_cache: LRUCache[AstSubMap] = LRUCache(budget)
 
+spans_cache: dict[str, Spans] = {}
+
+asset_cache: dict[str, Asset] = {}
+dgraph = DependencyGraph()
 twlayouts: dict[str, str] = {}
+# the layouts whose content changed since their tailwind was compiled
+stale_layouts: set[str] = set()
+# the class candidates of every content file and of every compiled layout
+candidates: dict[str, frozenset[str]] = {}
+twcandidates: dict[str, frozenset[str]] = {}
+# the asset compiles scheduled while parsing and the built comets waiting for
+# them to be saved
+asset_executor = ThreadPoolExecutor(thread_name_prefix="picomet-assets")
+asset_jobs: dict[str, Future[str]] = {}
+asset_lock = threading.Lock()
+waiting_comets: dict[str, Ast] = {}
+parsing = threading.local()
+# a lock per comet or layout being compiled, concurrent requests wait for it
+compiling: dict[str, threading.RLock] = {}
+compiling_lock = threading.Lock()
 if RUNSERVER:
+    cached = store.load()
+    asset_cache = {k: Asset(*loads(v)) for k, v in cached["asset"].items()}
+    dgraph = DependencyGraph({k: loads(v) for k, v in cached["dgraph"].items()})
+    twlayouts = dict(cached["twlayout"])
+elif not (BUILD | RECOMPILE):
     try:
-        with (cache_dir / "twlayouts.json").open() as f:
-            twlayouts = loads(f.read())
+        with (build_dir / "assets.json").open() as f:
+            asset_cache = {k: Asset(*v) for k, v in loads(f.read()).items()}
     except FileNotFoundError:
         pass
 
 
-def save_dgraph() -> None:
-    with open(cache_dir / "dgraph.json", "w") as f:
-        f.write(dumps(dgraph))
+def compile_lock(path: str) -> threading.RLock:
+    with compiling_lock:
+        lock = compiling.get(path)
+        if lock is None:
+            lock = compiling[path] = threading.RLock()
+        return lock
+
+
+def save_dgraph(components: set[str]) -> None:
+    """Save the dependents of components, the rest of the graph is unchanged."""
+    for component in components:
+        dependents = sorted(dgraph.get_dependents(component))
+        store.set("dgraph", component, dumps(dependents))
 
 
-def save_asset_cache() -> None:
-    with open(picomet_dir / ("build" if BUILD else "cache") / "assets.json", "w") as f:
-        f.write(dumps(asset_cache))
+def save_asset(path: str) -> None:
+    # the build writes its manifest once, after the compiles, in save_assets
+    if not BUILD:
+        store.set("asset", path, dumps(asset_cache[path]))
 
 
-def save_commet(path: str, ast: Ast, folder: Path) -> None:
-    _ast = deepcopy(ast)
+def save_assets() -> None:
+    """Write the manifest of the build from a snapshot of the compiled assets."""
+    with asset_lock:
+        manifest = dumps(asset_cache)
+    temporary = build_dir / "assets.json.tmp"
+    with open(temporary, "w") as f:
+        f.write(manifest)
+    os.replace(temporary, build_dir / "assets.json")
 
-    def process(node: AstElement) -> None:
-        try:
-            del node["parent"]  # type: ignore
-        except KeyError:
-            pass
+
+def save_commet(path: str, ast: Ast) -> None:
+    def serialize(node: AstElement) -> dict[str, Any]:
+        attrs = node.attrs
+        if BUILD:
+            attrs = [
+                AstAttr(k, edq(f"{STATIC_URL}{asset_cache[v].fname}"))
+                if isinstance(v, AssetUrl)
+                else AstAttr(k, v)
+                for k, v in attrs
+            ]
+        data: dict[str, Any] = {"tag": node.tag, "attrs": attrs}
+        if node.index >= 0 and not BUILD:
+            data["index"] = node.index
         if isNodeWithChildren(node):
-            for index, child in enumerate(node["children"]):
+            if node.file and not BUILD:
+                data["file"] = node.file
+            if node.isBase and not BUILD:
+                data["isBase"] = True
+            children: list[Any] = []
+            for index, child in enumerate(node.children):
                 if isNodeElement(child):
-                    if BUILD:
-                        if child["tag"] == "Tailwind":
-                            fname = asset_cache[cast(str, get_atrb(child, "layout"))][0]
-                            node["children"][index] = {
+                    if BUILD and child.tag == "Tailwind":
+                        layout = cast(str, get_atrb(child, "layout"))
+                        fname = asset_cache[layout].fname
+                        children.append(
+                            {
                                 "tag": "link",
                                 "attrs": [
-                                    ("rel", "stylesheet", None),
-                                    ("href", f"{STATIC_URL}{fname}", None),
+                                    ("rel", "stylesheet"),
+                                    ("href", f"{STATIC_URL}{fname}"),
                                 ],
                             }
-                    process(child)
+                        )
+                    else:
+                        children.append(serialize(child))
                 elif isinstance(child, str):
-                    if not settings.DEBUG and node["tag"] != "pre":
-                        clean = child
+                    if not settings.DEBUG and node.tag != "pre":
                         if index == 0:
-                            clean = re.sub(ltrim_re, "", clean)
-                        if index == (len(node["children"]) - 1):
-                            clean = re.sub(rtrim_re, "", clean)
-                        node["children"][index] = clean
-
-    process(_ast)
-
-    dest = folder / f"{get_comet_id(path)}.json"
-    with dest.open("w") as f:
-
-        class AstEncoder(JSONEncoder):
-            def default(self, obj: Any) -> Any:
-                if isinstance(obj, StrCode):
-                    return {
-                        "StrCode": True,
-                        "string": obj.string,
-                        "filename": obj.filename,
-                    }
-                elif isinstance(obj, Template):
-                    return {"DTL": True, "string": obj.template.source}
-                return super().default(obj)
-
-        f.write(dumps(_ast, cls=AstEncoder))
+                            child = re.sub(ltrim_re, "", child)
+                        if index == (len(node.children) - 1):
+                            child = re.sub(rtrim_re, "", child)
+                    children.append(child)
+                else:
+                    children.append(child)
+            data["children"] = children
+        return data
+
+    class AstEncoder(JSONEncoder):
+        def default(self, obj: Any) -> Any:
+            if isinstance(obj, StrCode):
+                return {
+                    "StrCode": True,
+                    "string": obj.string,
+                    "filename": obj.filename,
+                }
+            elif isinstance(obj, Template):
+                return {"DTL": True, "string": obj.template.source}
+            return super().default(obj)
+
+    data = dumps(serialize(ast), cls=AstEncoder)
+    if BUILD:
+        with (build_dir / "comets" / f"{get_comet_id(path)}.json").open("w") as f:
+            f.write(data)
+    else:
+        store.set("comet", path, data)
 
 
-def load_comet(path: str, folder: Path) -> None:
-    source = folder / f"{get_comet_id(path)}.json"
+def read_cached(kind: str, path: str) -> str | None:
+    """A comet or a map from the dev cache in runserver, from the build else."""
+    if RUNSERVER:
+        return store.get(kind, path)
+    source = build_dir / f"{kind}s" / f"{get_comet_id(path)}.json"
     if source.exists():
         with source.open() as f:
+            return f.read()
+    return None
 
-            def ast_decoder(_dict: dict) -> dict | StrCode | Template:
-                if _dict.get("StrCode"):
-                    return StrCode(_dict["string"], _dict["filename"])
-                elif _dict.get("DTL"):
-                    return django_engine.from_string(_dict["string"])
-                elif _dict.get("tag"):
-                    for attr in _dict["attrs"]:
-                        k, v, span = attr
-                        if isinstance(v, str):
-                            attr[1] = DQES(v)
-                        elif isinstance(v, dict):
-                            attr[1] = StrCode(v["string"], v["filename"])
-                return _dict
-
-            ast = loads(f.read(), object_hook=ast_decoder)
-
-            def process(node: AstElement) -> None:
-                if isNodeWithChildren(node):
-                    for child in node["children"]:
-                        if isNodeElement(child):
-                            child["parent"] = node  # type: ignore
-                            process(child)
 
-            process(ast)
+def load_comet(path: str) -> None:
+    data = read_cached("comet", path)
+    if data is not None:
+
+        def ast_decoder(_dict: dict) -> AstElement | StrCode | Template | dict:
+            if _dict.get("StrCode"):
+                return StrCode(_dict["string"], _dict["filename"])
+            elif _dict.get("DTL"):
+                return django_engine.from_string(_dict["string"])
+            elif "tag" in _dict:
+                attrs = [
+                    AstAttr(k, DQES(v) if isinstance(v, str) else v)
+                    for k, v in _dict["attrs"]
+                ]
+                index = _dict.get("index", -1)
+                if "children" in _dict:
+                    return ElementDoubleTag(
+                        _dict["tag"],
+                        attrs,
+                        [
+                            intern_str(c) if type(c) is str else c
+                            for c in _dict["children"]
+                        ],
+                        index,
+                        _dict.get("file"),
+                        _dict.get("isBase", False),
+                    )
+                return ElementSingleTag(_dict["tag"], attrs, index)
+            return _dict
 
-            ast_cache[path] = ast
+        ast_cache[path] = loads(data, object_hook=ast_decoder)
 
 
-def load_map(path: str, folder: Path) -> None:
-    source = folder / f"{get_comet_id(path)}.json"
-    if source.exists():
-        with source.open() as f:
-            map = loads(f.read())
-            map_cache[path] = map
+def save_spans(path: str, spans: Spans) -> None:
+    store.set("spans", path, dumps(spans))
 
 
-x_re = re.compile(
-    r"(?:(?:({\$)\s*((?:\"(?:\\\"|[^\"])*\"|'(?:\\'|[^'])*'|[^\"'\n])*?)\s*\$})|(({{)\s*((?:\"(?:\\\"|[^\"])*\"|'(?:\\'|[^'])*'|[^\"'\n])*?)\s*}})|({%\s*((?:\"(?:\\\"|[^\"])*\"|'(?:\\'|[^'])*'|[^\"'\n])*?)\s*%}))"
-)
+def get_spans(path: str) -> Spans | None:
+    """
+    Return the spans recorded for the elements of a comet, they are only kept
+    in DEBUG and when linting.
+    """
+    if not SPANS:
+        return None
+    spans = spans_cache.get(path)
+    if spans is None and not READONLY:
+        data = store.get("spans", path)
+        if data is not None:
+            spans = spans_cache[path] = [
+                (tuple(span), {k: tuple(v) for k, v in attrs.items()})
+                for span, attrs in loads(data)
+            ]
+    return spans
+
+
+def load_map(path: str) -> None:
+    data = read_cached("map", path)
+    if data is not None:
+        map = loads(data)
+        submap_cache[path] = {
+            "groups": {
+                id: [tuple(loc) for loc in locs] for id, locs in map["groups"].items()
+            },
+            "params": {
+                id: [tuple(loc) for loc in locs] for id, locs in map["params"].items()
+            },
+            "layouts": {id: tuple(loc) for id, loc in map["layouts"].items()},
+            "files": {
+                id: [tuple(loc) for loc in locs] for id, locs in map["files"].items()
+            },
+            "children": tuple(map["children"]),
+            "mounts": [
+                (tuple(loc), component) for loc, component in map.get("mounts", [])
+            ],
+        }
 
 
 class CometParser:
     def __init__(self, source: str, path: str, use_cache: bool = True):
-        self.ast: Ast | ElementDoubleTag = {
-            "tag": "Fragment",
-            "attrs": [],
-            "children": [],
-            "parent": None,
-            "file": path,
-            "isBase": False,
-        }
-        self.map: AstMap = {
-            "groups": {},
-            "params": {},
-            "layouts": {},
-            "files": {},
-            "children": [],
-        }
+        self.ast: Ast = ElementDoubleTag("Fragment", [], file=path)
+        self.spans: Spans = []
         self.imports: dict[str, str] = {}
-        self.current: Ast | ElementDoubleTag = self.ast
+        self.current: ElementDoubleTag = self.ast
         self.path = path
 
         ast_cached = ast_cache.get(path)
-        map_cached = map_cache.get(path)
-        if use_cache and (not ast_cached or not map_cache) and not (BUILD or RECOMPILE):
-            load_comet(path, (cache_dir if RUNSERVER else build_dir) / "comets")
-            load_map(path, (cache_dir if RUNSERVER else build_dir) / "maps")
-        ast_cached = ast_cache.get(path)
-        map_cached = map_cache.get(path)
+        map_cached = submap_cache.get(path)
+        if (
+            use_cache
+            and (not ast_cached or not map_cached)
+            and not (BUILD or RECOMPILE or LINT)
+        ):
+            load_comet(path)
+            load_map(path)
+            ast_cached = ast_cache.data.get(path)
+            map_cached = submap_cache.data.get(path)
 
         if (not ast_cached or not map_cached) or not use_cache:
-            for d1 in dgraph:
-                for i, d2 in enumerate(dgraph[d1]):
-                    if d2 == path:
-                        del dgraph[d1][i]
-            self.handle_children(HtmlAst(source).root.children)
+            components = set(dgraph.get_components(path))
+            dgraph.remove_components(path)
+            tokenizer = engines["picomet"].engine.tokenizer
+            self.handle_children(tokenizer(source).children)
+            candidates[path] = frozenset(candidate_re.findall(source))
             ast_cache[path] = self.ast
+            if SPANS:
+                spans_cache[path] = self.spans
             Mapper(self.ast, path)
             if BUILD:
                 if not twlayouts.get(path):
-                    save_commet(path, self.ast, build_dir / "comets")
-            else:
-                save_dgraph()
-                save_commet(path, self.ast, cache_dir / "comets")
+                    # saved with the urls of its assets once they compile
+                    waiting_comets[path] = self.ast
+            elif not READONLY:
+                save_dgraph(components | dgraph.get_components(path))
+                save_commet(path, self.ast)
+                if SPANS:
+                    save_spans(path, self.spans)
+            if LAZY:
+                stale_layouts.update(dgraph.related(path) & twlayouts.keys())
         else:
             self.ast = ast_cached
-            self.map = map_cached
+
+        if self.ast.tag == "Layout":
+            pin(find_component(str(get_atrb(self.ast, "@"))))
+        if path in pinned:
+            pin_components(self.ast)
+
+    @property
+    def map(self) -> AstMap:
+        return get_map(self.path)
 
     @property
     @cache
@@ -285,9 +413,7 @@ class CometParser:
             if not DEBUG:
                 self.handle_children(node.children)
         elif (
-            tag == "Layout"
-            and self.current is self.ast
-            and not len(self.ast["children"])
+            tag == "Layout" and self.current is self.ast and not len(self.ast.children)
         ):
             component = str(self.get_atrb(attrs, "@"))
             if len(os.path.basename(component).split(".")) == 1:
@@ -296,25 +422,16 @@ class CometParser:
             path = template.origin.name
             parse(template.source, path)
             self.add_dep(path, self.path)
-            elLayout: ElementDoubleTag = {
-                "tag": "Layout",
-                "attrs": self.convert_attrs(attrs),
-                "children": [],
-                "parent": self.current,
-                "span": get_span(node),
-            }
-            elPage: ElementDoubleTag = {
-                "tag": "Fragment",
-                "attrs": [],
-                "children": [],
-                "parent": elLayout,
-                "file": self.ast.pop("file"),
-            }
-            elLayout["children"].append(elPage)
+            elLayout = ElementDoubleTag(
+                "Layout", self.convert_attrs(attrs), index=self.add_spans(node)
+            )
+            elPage = ElementDoubleTag("Fragment", [], file=self.ast.file)
+            self.ast.file = None
+            elLayout.children.append(elPage)
             self.ast = elLayout
             self.current = elPage
             self.handle_children(node.children)
-            self.current = self.current["parent"]
+            self.current = elLayout
         elif (
             self.imports.get(tag)
             or engines["picomet"].engine.components.get(tag)
@@ -333,18 +450,14 @@ class CometParser:
             self.add_dep(path, self.path)
             attributes = self.process_attrs(attrs)
             if self.get_atrb(attrs, "@") is Undefined:
-                attributes = [AstAttr("@", edq(component), None)] + attributes
-            elInclude: ElementDoubleTag = {
-                "tag": "Include",
-                "attrs": self.process_props(attributes),
-                "children": [],
-                "parent": self.current,
-                "span": get_span(node),
-            }
-            self.current["children"].append(elInclude)
-            self.current = elInclude
+                attributes = [AstAttr("@", edq(component))] + attributes
+            elInclude = ElementDoubleTag(
+                "Include", self.process_props(attributes), index=self.add_spans(node)
+            )
+            self.current.children.append(elInclude)
+            parent, self.current = self.current, elInclude
             self.handle_children(node.children)
-            self.current = self.current["parent"]
+            self.current = parent
         else:
             if tag == "With":
                 attributes = self.withs(attrs)
@@ -352,49 +465,28 @@ class CometParser:
                 attributes = self.defaults(attrs)
             else:
                 attributes = self.process_attrs(attrs)
-            element: ElementDoubleTag = {
-                "tag": tag,
-                "attrs": attributes,
-                "children": [],
-                "parent": self.current,
-                "span": get_span(node),
-            }
-            self.current["children"].append(element)
-            self.current = element
+            element = ElementDoubleTag(tag, attributes, index=self.add_spans(node))
+            self.current.children.append(element)
+            parent, self.current = self.current, element
             self.handle_children(node.children)
-            self.current = self.current["parent"]
+            self.current = parent
 
     def handle_singletag(self, node: SingleTagNode) -> None:
         tag = node.tag
         attrs = node.attrs
-        elInclude: ElementSingleTag
         if tag == "Outlet":
             attributes: AstAttrs = []
             if self.name:
                 layout = edq(mdhash(self.name, 8))
-                attributes.append(AstAttr("layout", layout, None))
-            elOutlet: ElementDoubleTag = {
-                "tag": "Outlet",
-                "attrs": attributes,
-                "children": [],
-                "parent": self.current,
-            }
-            elInclude = {
-                "tag": "Children",
-                "attrs": [],
-                "parent": elOutlet,
-                "span": get_span(node),
-            }
-            elOutlet["children"].append(elInclude)
-            self.current["children"].append(elOutlet)
+                attributes.append(AstAttr("layout", layout))
+            elOutlet = ElementDoubleTag("Outlet", attributes)
+            elOutlet.children.append(
+                ElementSingleTag("Children", [], self.add_spans(node))
+            )
+            self.current.children.append(elOutlet)
         elif tag == "Children":
-            self.current["children"].append(
-                {
-                    "tag": tag,
-                    "attrs": self.convert_attrs(attrs),
-                    "parent": self.current,
-                    "span": get_span(node),
-                }
+            self.current.children.append(
+                ElementSingleTag(tag, self.convert_attrs(attrs), self.add_spans(node))
             )
         elif tag.startswith("Import."):
             component = self.get_atrb(attrs, "@")
@@ -419,30 +511,19 @@ class CometParser:
                 self.add_dep(path, self.path)
                 attributes = self.process_attrs(attrs)
                 if self.get_atrb(attrs, "@") is Undefined:
-                    attributes = [AstAttr("@", edq(component), None)] + attributes
-                elFragment: ElementDoubleTag = {
-                    "tag": "Fragment",
-                    "attrs": [],
-                    "children": [],
-                    "parent": self.current,
-                }
-                elInclude = {
-                    "tag": "Include",
-                    "attrs": self.process_props(attributes),
-                    "parent": elFragment,
-                    "span": get_span(node),
-                }
-                elFragment["children"].append(elInclude)
-                self.current["children"].append(elFragment)
+                    attributes = [AstAttr("@", edq(component))] + attributes
+                elFragment = ElementDoubleTag("Fragment", [])
+                elFragment.children.append(
+                    ElementSingleTag(
+                        "Include", self.process_props(attributes), self.add_spans(node)
+                    )
+                )
+                self.current.children.append(elFragment)
         elif tag == "Group":
-            self.current["children"].append(
-                {
-                    "tag": tag,
-                    "attrs": self.convert_attrs(attrs),
-                    "children": [],
-                    "parent": self.current,
-                    "span": get_span(node),
-                }
+            self.current.children.append(
+                ElementDoubleTag(
+                    tag, self.convert_attrs(attrs), index=self.add_spans(node)
+                )
             )
         elif tag == "Js" or tag == "Ts" or tag == "Css" or tag == "Sass":
             asset_name = self.get_atrb(attrs, "@")
@@ -453,65 +534,63 @@ class CometParser:
                     if asset:
                         self.add_dep(asset, self.path)
                         if not asset_cache.get(asset):
-                            compile_asset(asset)
+                            schedule_asset(asset, compile_asset)
                         self.set_atrb(attributes, "@", DQES(asset))
-                self.current["children"].append(
-                    {
-                        "tag": tag,
-                        "attrs": attributes,
-                        "parent": self.current,
-                        "span": get_span(node),
-                    }
+                        if BUILD:
+                            self.set_atrb(attributes, "s-src", AssetUrl(asset))
+                self.current.children.append(
+                    ElementSingleTag(tag, attributes, self.add_spans(node))
                 )
         elif tag == "Tailwind":
-            if self.current["tag"] == "head":
+            if self.current.tag == "head":
                 twlayouts[self.path] = str(self.get_atrb(attrs, "@"))
-                if not BUILD:
-                    with open(cache_dir / "twlayouts.json", "w") as f:
-                        f.write(dumps(twlayouts))
+                if not (BUILD or READONLY):
+                    store.set("twlayout", self.path, twlayouts[self.path])
                 attributes = self.convert_attrs(attrs)
-                attributes = [AstAttr("layout", edq(self.path), None)] + attributes
-                self.current["children"].append(
-                    {
-                        "tag": tag,
-                        "attrs": attributes,
-                        "parent": self.current,
-                    }
-                )
+                attributes = [AstAttr("layout", edq(self.path))] + attributes
+                self.current.children.append(ElementSingleTag(tag, attributes))
         else:
             attributes = self.process_attrs(attrs)
-            self.current["children"].append(
-                {"tag": tag, "attrs": attributes, "parent": self.current}
+            self.current.children.append(
+                ElementSingleTag(tag, attributes, self.add_spans(node))
             )
 
     def handle_text(self, node: TextNode) -> None:
         text = node.text
-        matches = list(re.finditer(x_re, text))
-        if len(matches):
-            previous = None
-            for match in matches:
-                self.current["children"].append(
-                    text[previous if previous else 0 : match.start()]
+        interpolations, errors = scan(text)
+        if errors and DEBUG and self.current.tag not in ["script", "style"]:
+            error = errors[0]
+            row, col = get_position(text, error.offset, node.start.row, node.start.col)
+            raise TemplateSyntaxError(
+                f"{error.message} for '{{$' at {self.path}:{row + 1}:{col + 1}"
+            )
+        if len(interpolations):
+            previous = 0
+            for interpolation in interpolations:
+                self.current.children.append(
+                    intern_str(text[previous : interpolation.start])
                 )
-                groups = [group for group in (match.groups()) if group is not None]
-                if groups[0] == "{$":
-                    self.current["children"].append(StrCode(groups[1], self.path))
-                elif groups[0].startswith("{{") or groups[0].startswith("{%"):
-                    self.current["children"].append(
-                        django_engine.from_string(groups[0])
+                if interpolation.delimiter == "{$":
+                    self.current.children.append(
+                        StrCode(interpolation.expression, self.path)
+                    )
+                else:
+                    self.current.children.append(
+                        django_engine.from_string(
+                            text[interpolation.start : interpolation.end]
+                        )
                     )
-                previous = match.end()
-            if previous:
-                self.current["children"].append(text[previous:])
+                previous = interpolation.end
+            self.current.children.append(intern_str(text[previous:]))
         else:
-            self.current["children"].append(text)
+            self.current.children.append(intern_str(text))
 
     def handle_doctype(self, node: DoctypeNode) -> None:
-        self.ast["isBase"] = True
-        self.current["children"].append(f"<!doctype {node.text}>")
+        self.ast.isBase = True
+        self.current.children.append(f"<!doctype {node.text}>")
 
     def handle_comment(self, node: CommentNode) -> None:
-        self.current["children"].append(f"<!-- {node.text} -->")
+        self.current.children.append(f"<!-- {node.text} -->")
 
     def get_atrb(
         self, attrs: list[AttrNode], name: str, default: str | UndefinedType = Undefined
@@ -521,12 +600,18 @@ class CometParser:
                 return attr.value
         return default
 
+    def add_spans(self, node: DoubleTagNode | SingleTagNode) -> int:
+        if not SPANS:
+            return -1
+        self.spans.append(
+            (get_span(node), {attr.name: get_span(attr) for attr in node.attrs})
+        )
+        return len(self.spans) - 1
+
     def convert_attrs(self, attrs: list[AttrNode]) -> AstAttrs:
         attributes: AstAttrs = []
         for attr in attrs:
-            attributes.append(
-                AstAttr(attr.name, self.convert_value(attr.value), get_span(attr))
-            )
+            attributes.append(AstAttr(attr.name, self.convert_value(attr.value)))
         return attributes
 
     def convert_value(self, value: str | None) -> DQES | None:
@@ -542,9 +627,9 @@ class CometParser:
     ) -> None:
         for index, attr in enumerate(attrs):
             if attr[0] == name:
-                attrs[index] = AstAttr(name, value, None)
+                attrs[index] = AstAttr(name, value)
                 return
-        attrs.append(AstAttr(name, value, None))
+        attrs.append(AstAttr(name, value))
 
     def process_attrs(self, attrs: list[AttrNode]) -> AstAttrs:
         attributes: AstAttrs = []
@@ -552,53 +637,49 @@ class CometParser:
             k = attr.name
             v = attr.value
             if (
-                k in ["s-show", "s-if", "s-elif", "s-in", "s-of", "s-key", "s-text"]
+                k
+                in [
+                    "s-show",
+                    "s-if",
+                    "s-elif",
+                    "s-in",
+                    "s-of",
+                    "s-key",
+                    "s-text",
+                    "s-batch",
+                ]
                 or k.startswith("s-prop:")
                 or k.startswith("s-bind:")
                 or k.startswith("s-toggle:")
                 or k.startswith("x-prop:")
             ) and v is not None:
-                attributes += [AstAttr(k, self.compile(v), get_span(attr))]
+                attributes += [AstAttr(k, self.compile(v))]
             elif k.startswith("s-asset:") and v is not None:
                 asset = find_in_assets(v)
                 if asset:
+                    schedule_asset(asset, compile_resouce)
                     if not BUILD:
                         self.add_dep(asset, self.path)
                         attributes += [
-                            AstAttr(k, edq(asset), get_span(attr)),
-                            AstAttr(
-                                "data-asset-id",
-                                edq(compile_resouce(asset)),
-                                get_span(attr),
-                            ),
-                            AstAttr(
-                                "data-target", edq(k.split(":")[1]), get_span(attr)
-                            ),
+                            AstAttr(k, edq(asset)),
+                            AstAttr("data-asset-id", edq(get_asset_id(asset))),
+                            AstAttr("data-target", edq(k.split(":")[1])),
                         ]
                     else:
-                        compile_resouce(asset)
-                        attributes += [
-                            AstAttr(
-                                k.split(":")[1],
-                                edq(f"{STATIC_URL}{asset_cache[asset][0]}"),
-                                get_span(attr),
-                            )
-                        ]
+                        attributes += [AstAttr(k.split(":")[1], AssetUrl(asset))]
             elif k.startswith("s-static:"):
                 attributes.append(
-                    AstAttr(
-                        k.split(":")[1], escape(settings.STATIC_URL + v), get_span(attr)
-                    )
+                    AstAttr(k.split(":")[1], escape(settings.STATIC_URL + v))
                 )
             elif k == "server" or k == "client":
-                attributes.append(AstAttr("mode", DQES(k), get_span(attr)))
+                attributes.append(AstAttr("mode", DQES(k)))
             elif (k.startswith("x-") or k.startswith("@")) and isinstance(v, str):
                 sprop = r"\$S\(`([^`]+)`\)"
                 for match in re.finditer(sprop, v):
                     expression = match.group(1)
                     name = re.sub(r"[^\w\d_]", "_", expression).lower()
                     attributes.append(
-                        AstAttr(f"s-prop:{name}", self.compile(expression), None)
+                        AstAttr(f"s-prop:{name}", self.compile(expression))
                     )
                     v = v.replace(match.group(0), name)
                 xprop = r"\$X\(`([^`]+)`\)"
@@ -606,27 +687,25 @@ class CometParser:
                     expression = match.group(1)
                     name = re.sub(r"[^\w\d_]", "_", expression).lower()
                     attributes.append(
-                        AstAttr(f"x-prop:{name}", self.compile(expression), None)
+                        AstAttr(f"x-prop:{name}", self.compile(expression))
                     )
                     v = v.replace(match.group(0), name)
-                attributes.append(AstAttr(k, self.convert_value(v), get_span(attr)))
+                attributes.append(AstAttr(k, self.convert_value(v)))
             else:
-                attributes.append(AstAttr(k, self.convert_value(v), get_span(attr)))
+                attributes.append(AstAttr(k, self.convert_value(v)))
 
-        if self.current["tag"] == "Helmet":
-            attributes.append(AstAttr("x-head", None, None))
+        if self.current.tag == "Helmet":
+            attributes.append(AstAttr("x-head", None))
 
         return attributes
 
     def process_props(self, attrs: AstAttrs) -> AstAttrs:
         _props: AstAttrs = []
         for attr in attrs:
-            k, v, span = attr
+            k, v = attr
             if isinstance(v, str) and k.startswith("."):
                 _props.append(
-                    AstAttr(
-                        k, self.compile("True") if v is None else self.compile(v), span
-                    )
+                    AstAttr(k, self.compile("True") if v is None else self.compile(v))
                 )
             else:
                 _props.append(attr)
@@ -641,11 +720,7 @@ class CometParser:
             k = attr.name
             v = attr.value
             _withs.append(
-                AstAttr(
-                    k,
-                    self.compile("True") if v is None else self.compile(v),
-                    get_span(attr),
-                )
+                AstAttr(k, self.compile("True") if v is None else self.compile(v))
             )
         return _withs
 
@@ -655,99 +730,154 @@ class CometParser:
             k = attr.name
             v = attr.value
             if isinstance(v, str):
-                _defaults.append(AstAttr(k, self.compile(v), get_span(attr)))
+                _defaults.append(AstAttr(k, self.compile(v)))
         return _defaults
 
     def add_dep(self, component: str, dependent: str) -> None:
-        dgraph.setdefault(component, [])
-        if dependent not in dgraph[component]:
-            dgraph[component].append(dependent)
+        dgraph.add(component, dependent)
 
 
 def parse(source: str, path: str, use_cache: bool = True) -> CometParser:
-    return CometParser(source, path, use_cache)
+    """
+    Parse a comet, the assets it uses compile concurrently and are waited for
+    when the outermost parse of the thread returns.
+    """
+    depth = getattr(parsing, "depth", 0)
+    parsing.depth = depth + 1
+    try:
+        if LAZY:
+            with compile_lock(path):
+                parser = CometParser(source, path, use_cache)
+        else:
+            parser = CometParser(source, path, use_cache)
+    finally:
+        parsing.depth = depth
+    if not depth and not getattr(parsing, "deferred", False):
+        wait_assets()
+    return parser
+
+
+def schedule_asset(path: str, compile: Callable[[str], str]) -> None:
+    if READONLY:
+        return
+    with asset_lock:
+        if path not in asset_jobs:
+            asset_jobs[path] = asset_executor.submit(compile, path)
+
+
+def wait_assets() -> None:
+    """
+    Wait for the scheduled asset compiles, then save the built comets using
+    them. The first error of a compile is raised.
+    """
+    with asset_lock:
+        jobs = list(asset_jobs.items())
+    error: BaseException | None = None
+    for path, job in jobs:
+        exception = job.exception()
+        if exception is not None and error is None:
+            error = exception
+    with asset_lock:
+        for path, job in jobs:
+            if asset_jobs.get(path) is job:
+                del asset_jobs[path]
+    if error is not None:
+        raise error
+    if BUILD:
+        for path in list(waiting_comets):
+            save_commet(path, waiting_comets.pop(path))
+
+
+@contextmanager
+def deferred_assets() -> Iterator[None]:
+    """Wait for the assets scheduled by the parses inside once, at the end."""
+    deferred = getattr(parsing, "deferred", False)
+    parsing.deferred = True
+    try:
+        yield
+    finally:
+        parsing.deferred = deferred
+    if not deferred:
+        wait_assets()
 
 
 class Mapper:
+    """
+    Map the locations of the files, groups, params, layouts and children of a
+    comet. Included components are recorded as mounts and their own maps are
+    composed in lazily by ``get_map``.
+    """
+
     def __init__(self, ast: Ast, path: str) -> None:
         self.ast: Ast = ast
         self.path: str = path
-        self.map: AstMap = {
+        self.map: AstSubMap = {
             "groups": {},
             "params": {},
             "layouts": {},
             "files": {},
-            "children": [],
+            "children": (),
+            "mounts": [],
         }
-        self.map_node(ast)
-
-        map_cache[path] = self.map
-
-        maps_dir = (build_dir if BUILD else cache_dir) / "maps"
-        dest = maps_dir / f"{get_comet_id(path)}.json"
-        with dest.open("w") as f:
-            f.write(dumps(self.map))
-
-    def map_node(self, node: AstElement, loc: list[int] = []) -> None:
-        tag = node["tag"]
-        comet: str
-        file = node.get("file")
-        if isinstance(file, str):
-            self.map["files"].setdefault(file, [])
-            self.map["files"][file].append(loc.copy())
-
-        self.map_group_n_param(node["attrs"], loc)
+        self.map_node(ast, ())
+
+        submap_cache[path] = self.map
+        map_cache.pop(path, None)
+        for dependent in dgraph.all_dependents(path):
+            map_cache.pop(dependent, None)
+
+        if BUILD:
+            # build maps are self contained
+            self.map = cast(AstSubMap, {**get_map(path), "mounts": []})
+            with (build_dir / "maps" / f"{get_comet_id(path)}.json").open("w") as f:
+                f.write(dumps(self.map))
+        elif not READONLY:
+            store.set("map", path, dumps(self.map))
+
+    def map_node(self, node: AstElement, loc: SubLoc) -> None:
+        tag = node.tag
+        self.map_group_n_param(node.attrs, loc)
         if isNodeWithChildren(node):
+            if node.file and not BUILD:
+                self.map["files"].setdefault(node.file, []).append(loc)
             if tag in ["Layout", "Include"]:
                 at = get_atrb(node, "@")
                 if isinstance(at, str):
-                    comet = at
-                    if not comet.endswith(".html"):
-                        comet = f"{comet}.html"
-                    template = loader.get_template(comet, using="picomet").template
-                    parser = parse(template.source, template.origin.name)
-                    self.load_map(parser.map, loc)
-                    for index, child in enumerate(node["children"]):
+                    path = find_component(at)
+                    self.map["mounts"].append((loc, path))
+                    for index, child in enumerate(node.children):
                         if isNodeElement(child):
-                            self.map_node(child, loc + parser.map["children"] + [index])
+                            self.map_node(child, (*loc, path, index))
                 return
             elif tag == "Outlet":
                 layout = get_atrb(node, "layout")
                 if isinstance(layout, str):
-                    self.map["layouts"].setdefault(layout, [])
-                    self.map["layouts"][layout] = loc.copy()
-                self.map["children"] = loc + [0]
+                    self.map["layouts"][layout] = loc
+                self.map["children"] = (*loc, 0)
                 return
 
-            for index, child in enumerate(node["children"]):
+            for index, child in enumerate(node.children):
                 if isNodeElement(child):
-                    self.map_node(child, loc + [index])
+                    self.map_node(child, (*loc, index))
         elif tag == "Include":
             at = get_atrb(node, "@")
             if isinstance(at, str):
-                comet = at
-                if not comet.endswith(".html"):
-                    comet = f"{comet}.html"
-                template = loader.get_template(comet, using="picomet").template
-                parser = parse(template.source, template.origin.name)
-                self.load_map(parser.map, loc)
+                self.map["mounts"].append((loc, find_component(at)))
 
     def find_loc(
         self, tag: str, ast: AstElement, attrs: PureAttrs, loc: list[int] | None = None
     ) -> list[int] | None:
         loc = loc or []
-        if ast["tag"] == tag:
+        if ast.tag == tag:
             for attr in attrs:
                 if not (get_atrb(ast, attr[0]) == attr[1]):
                     break
             else:
                 return loc
-        if "children" not in ast:
+        if not isNodeWithChildren(ast):
             return None
-        ast = cast(ElementDoubleTag, ast)
-        for index, child in enumerate(ast["children"]):
-            if isinstance(child, dict):
-                child = cast(AstElement, child)
+        for index, child in enumerate(ast.children):
+            if isNodeElement(child):
                 loc.append(index)
                 _loc = self.find_loc(tag, child, attrs, loc=loc)
                 if _loc:
@@ -758,7 +888,7 @@ class Mapper:
     def find_node(
         self, tag: str, ast: AstElement, attrs: PureAttrs
     ) -> AstElement | None:
-        if ast["tag"] == tag:
+        if ast.tag == tag:
             for attr in attrs:
                 if not (get_atrb(ast, attr[0]) == attr[1]):
                     break
@@ -766,37 +896,121 @@ class Mapper:
                 return ast
         if not isNodeWithChildren(ast):
             return None
-        for child in ast["children"]:
+        for child in ast.children:
             if isNodeElement(child):
                 node = self.find_node(tag, child, attrs)
                 if node:
                     return node
         return None
 
-    def map_group_n_param(self, attrs: AstAttrs, loc: list[int]) -> None:
+    def map_group_n_param(self, attrs: AstAttrs, loc: SubLoc) -> None:
         sgroup = get_atrb(attrs, "s-group")
         if isinstance(sgroup, str):
             for group in sgroup.split(","):
-                self.map["groups"].setdefault(group, [])
-                self.map["groups"][group].append(loc.copy())
+                self.map["groups"].setdefault(group, []).append(loc)
         sparam = get_atrb(attrs, "s-param")
         if isinstance(sparam, str):
             for param in sparam.split(","):
-                self.map["params"].setdefault(param, [])
-                self.map["params"][param].append(loc.copy())
-
-    def load_map(self, map: AstMap, loc: list[int]) -> None:
-        for target in map:
-            if target in ["files", "groups", "params"]:
-                target = cast(Literal["files", "groups", "params"], target)
-                for id in map[target]:
-                    self.map[target].setdefault(id, [])
-                    self.map[target][id] += list(
-                        [(loc + _loc) for _loc in map[target][id]]
-                    )
-        layouts = map["layouts"]
-        for id in layouts:
-            self.map["layouts"][id] = loc + layouts[id]
+                self.map["params"].setdefault(param, []).append(loc)
+
+
+def find_component(name: str) -> str:
+    if not name.endswith(".html"):
+        name = f"{name}.html"
+    path = comets.find(name)
+    if not path:
+        template = loader.get_template(name, using="picomet").template
+        path = str(template.origin.name)
+    return path
+
+
+def pin(path: str) -> None:
+    if path not in pinned:
+        pinned.add(path)
+        ast = ast_cache.data.get(path)
+        if ast is not None:
+            pin_components(ast)
+
+
+def pin_components(node: AstElement) -> None:
+    if isNodeWithChildren(node):
+        if node.tag in ["Layout", "Include"]:
+            pin(find_component(str(get_atrb(node, "@"))))
+        for child in node.children:
+            if isNodeElement(child):
+                pin_components(child)
+    elif node.tag == "Include":
+        pin(find_component(str(get_atrb(node, "@"))))
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    from picomet.loaders import fcache
+
+    stats = {
+        "ast_cache": ast_cache.stats(),
+        "submap_cache": submap_cache.stats(),
+        "map_cache": map_cache.stats(),
+        "fcache": fcache.stats(),
+    }
+    if budget is not None:
+        stats["budget"] = {"limit": budget.limit, "used": budget.used}
+    return stats
+
+
+def get_submap(path: str) -> AstSubMap:
+    submap = submap_cache.get(path)
+    if not submap:
+        load_map(path)
+        submap = submap_cache.data.get(path)
+    if not submap:
+        with open(path) as f:
+            parse(f.read(), path)
+        submap = submap_cache[path]
+    return submap
+
+
+def get_map(path: str) -> AstMap:
+    """Return the map of a comet with the maps of its components composed in."""
+    map = map_cache.get(path)
+    if map is None:
+        submap = get_submap(path)
+
+        def resolve(loc: SubLoc) -> Loc:
+            resolved: list[int] = []
+            for index in loc:
+                if isinstance(index, str):
+                    resolved += get_map(index)["children"]
+                else:
+                    resolved.append(index)
+            return tuple(resolved)
+
+        map = {
+            "groups": {},
+            "params": {},
+            "layouts": {},
+            "files": {},
+            "children": resolve(submap["children"]),
+        }
+        targets: list[Literal["files", "groups", "params"]] = [
+            "files",
+            "groups",
+            "params",
+        ]
+        for target in targets:
+            for id, sublocs in submap[target].items():
+                map[target][id] = [resolve(subloc) for subloc in sublocs]
+        for id, subloc in submap["layouts"].items():
+            map["layouts"][id] = resolve(subloc)
+        for subloc, component in submap["mounts"]:
+            prefix = resolve(subloc)
+            component_map = get_map(component)
+            for target in targets:
+                for id, locs in component_map[target].items():
+                    map[target].setdefault(id, []).extend(prefix + loc for loc in locs)
+            for id, loc in component_map["layouts"].items():
+                map["layouts"][id] = prefix + loc
+        map_cache[path] = map
+    return map
 
 
 sass_load_paths = [
@@ -805,155 +1019,171 @@ sass_load_paths = [
 ]
 
 
+def get_asset_id(path: str) -> str:
+    name = os.path.splitext(os.path.basename(path))[0]
+    return f"{name}-{mdhash(path,6)}"
+
+
 def compile_asset(path: str) -> str:
-    from picomet.loaders import cache_file, fcache
+    from picomet.loaders import read_file
 
-    if not fcache.get(path):
-        with open(path) as f:
-            cache_file(path, f.read())
+    source = read_file(path)
 
     name, ext = os.path.splitext(os.path.basename(path))
     compiled: str
     if ext == ".ts":
-        from javascript import require
-
-        compiled = (
-            require("esbuild")
-            .buildSync(
-                {
-                    "target": "es6",
-                    "stdin": {
-                        "contents": fcache[path],
-                        "loader": "ts",
-                    },
-                    "write": False,
-                    "minify": BUILD,
-                }
-            )
-            .outputFiles[0]
-            .text
+        compiled = compile_cached(
+            "ts",
+            "esbuild",
+            path,
+            {"contents": source, "target": "es6", "minify": BUILD},
         )
         ext = ".js"
     elif ext == ".scss":
-        from javascript import require
-
-        compiled = (
-            require("sass")
-            .compileString(
-                fcache[path],
-                {
-                    "loadPaths": sass_load_paths,
-                    "style": "compressed" if BUILD else "expanded",
-                },
-            )
-            .css
+        compiled = compile_cached(
+            "sass",
+            "sass",
+            path,
+            {
+                "contents": source,
+                "loadPaths": sass_load_paths,
+                "style": "compressed" if BUILD else "expanded",
+            },
+            sass_imports(path, source, sass_load_paths),
         )
         ext = ".css"
     else:
-        compiled = fcache[path]
-    id = f"{name}-{mdhash(path,6)}"
-    fname = f"{id}.{mdhash(compiled,6)}{ext}"
-    asset_cache[path] = (fname, compiled)
-    for file in glob(str(assets_dir / f"{id}.*{ext}")):
-        if os.path.exists(str(file)):
-            os.remove(str(file))
-    with open(assets_dir / fname, "w") as f:
-        f.write(compiled)
-    save_asset_cache()
+        compiled = source
+    candidates[path] = frozenset(candidate_re.findall(source))
+    id = get_asset_id(path)
+    hash = mdhash(compiled, 6)
+    fname = f"{id}.{hash}{ext}"
+    with asset_lock:
+        asset_cache[path] = Asset(fname, hash, len(compiled.encode()))
+    # the name of an output changes with its content
+    if not (assets_dir / fname).exists():
+        for file in glob(str(assets_dir / f"{id}.*{ext}")):
+            if os.path.exists(str(file)):
+                os.remove(str(file))
+        with open(assets_dir / fname, "w") as f:
+            f.write(compiled)
+    save_asset(path)
 
     return id
 
 
 def compile_resouce(path: str) -> str:
-    from picomet.loaders import cache_file, fcache
-
-    if not fcache.get(path):
-        with open(path, "rb") as f:
-            cache_file(path, base64.b64encode(f.read()).decode("utf-8"))
-    name, ext = os.path.splitext(os.path.basename(path))
-    compiled = fcache[path]
-    id = f"{name}-{mdhash(path,6)}"
-    fname = f"{id}.{mdhash(compiled,6)}{ext}"
-    asset_cache[path] = (fname, compiled)
-    for file in glob(str(assets_dir / f"{id}.*{ext}")):
-        if os.path.exists(str(file)):
-            os.remove(str(file))
-    with open(assets_dir / fname, "wb") as f:
-        f.write(base64.b64decode(compiled))
-    save_asset_cache()
+    """
+    Link a binary resource in the assets folder under a name with its content
+    hash, streaming it from the file without reading it in memory.
+    """
+    from picomet.loaders import cache_hash
+
+    digest = file_hash(path)
+    cache_hash(path, digest[:8])
+    ext = os.path.splitext(path)[1]
+    id = get_asset_id(path)
+    hash = digest[:6]
+    fname = f"{id}.{hash}{ext}"
+    with asset_lock:
+        asset_cache[path] = Asset(fname, hash, os.path.getsize(path))
+    if not (assets_dir / fname).exists():
+        for file in glob(str(assets_dir / f"{id}.*{ext}")):
+            if os.path.exists(str(file)):
+                os.remove(str(file))
+        link_blob(save_blob(path, digest), assets_dir / fname)
+    save_asset(path)
     return id
 
 
-def compile_tailwind(layout: str) -> None:
+def get_candidates(path: str) -> frozenset[str]:
+    found = candidates.get(path)
+    if found is None:
+        from picomet.loaders import fcache
+
+        found = frozenset()
+        if os.path.splitext(path)[1] in PLAINTEXT_FILES:
+            source = fcache.get(path)
+            if source is None and os.path.isfile(path):
+                with open(path) as f:
+                    source = f.read()
+            if source is not None:
+                found = frozenset(candidate_re.findall(source))
+        candidates[path] = found
+    return found
+
+
+def compile_tailwind(layout: str, incremental: bool = False) -> bool:
+    """
+    Compile the tailwind of layout and return whether it was compiled. An
+    incremental compile is skipped when its content has no new class
+    candidate since the last one.
+    """
+    stale_layouts.discard(layout)
+    found = frozenset().union(*map(get_candidates, dgraph.related(layout)))
+    if (
+        incremental
+        and layout in asset_cache
+        and found <= twcandidates.get(layout, frozenset())
+    ):
+        return False
     source_id = twlayouts[layout]
     picomet_engine = engines["picomet"].engine
     input_css = picomet_engine.find_template(f"{source_id}.tailwind.css")[1].name
     tailwind_conf = picomet_engine.find_template(f"{source_id}.tailwind.js")[1].name
     postcss_conf = picomet_engine.find_template(f"{source_id}.postcss.js")[1].name
 
-    content = []
-
-    def find_depending(f: str) -> None:
-        if f not in content:
-            content.append(f)
-        for d1 in dgraph:
-            for d2 in dgraph[d1]:
-                if d2 == f:
-                    find_depending(d1)
-
-    def find_depended(f: str) -> None:
-        if f not in content:
-            content.append(f)
-        for d in dgraph.get(f, []):
-            find_depended(d)
-            find_depending(d)
-
-    find_depending(layout)
-    find_depended(layout)
-
-    from javascript import require
-
-    css, fname, compiled = require("./tailwind.js").compile(
-        input_css,
-        tailwind_conf,
-        postcss_conf,
-        assets_dir.as_posix(),
-        f"{os.path.basename(source_id)}-{mdhash(layout,6)}",
-        content,
-        DEBUG,
+    content = sorted(dgraph.related(layout))
+
+    css, fname, hash, size = worker.call(
+        "tailwind",
+        layout,
+        {
+            "inputCss": input_css,
+            "tailwindConf": tailwind_conf,
+            "postcssConf": postcss_conf,
+            "destDir": assets_dir.as_posix(),
+            "id": f"{os.path.basename(source_id)}-{mdhash(layout,6)}",
+            "content": content,
+            "DEBUG": DEBUG,
+        },
     )
     from picomet.loaders import cache_file
 
     cache_file(input_css, css)
-    asset_cache[layout] = (fname, compiled)
-    save_asset_cache()
+    asset_cache[layout] = Asset(fname, hash, size)
+    twcandidates[layout] = found
+    save_asset(layout)
+    return True
+
+
+def compile_layouts(path: str) -> None:
+    """Compile the tailwind of the layouts of path that are stale or missing."""
+    related = dgraph.related(path)
+    for layout in sorted(related & twlayouts.keys()):
+        if layout in stale_layouts or layout not in asset_cache:
+            with compile_lock(layout):
+                if layout in stale_layouts or layout not in asset_cache:
+                    compile_tailwind(layout, incremental=True)
+
+
+@lru_cache(maxsize=128)
+def read_asset(fname: str) -> str:
+    """
+    The content of a compiled asset, read from its file on first use. Files
+    are named by their content so they never change.
+    """
+    # the assets compiled by this process, then the ones of the build
+    for directory in [assets_dir, build_dir / "assets"]:
+        if (directory / fname).is_file():
+            with open(directory / fname) as f:
+                return f.read()
+    raise FileNotFoundError(assets_dir / fname)
 
 
 def find_in_comets(name: str | DQES) -> str | None:
-    comet_dirs = list(
-        chain.from_iterable(
-            [
-                [str(d) for d in loader.get_dirs()]
-                for loader in engines["picomet"].engine.template_loaders
-            ]
-        )
-    )
-    return find_in_dirs(name, comet_dirs)
+    return comets.find(name)
 
 
 def find_in_assets(name: str | DQES) -> str | None:
-    asset_dirs = [
-        *[str(d) for d in ASSETFILES_DIRS],
-        *[os.path.join(app.path, "assets") for app in apps.get_app_configs()],
-    ]
-    return find_in_dirs(name, asset_dirs)
-
-
-def find_in_dirs(name: str, dirs: list[str]) -> str | None:
-    for d in dirs:
-        directory = Path(d)
-        if directory.is_dir():
-            file = directory / name
-            if file.exists():
-                return file.as_posix()
-    return None
+    return assets.find(name)
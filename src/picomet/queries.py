@@ -0,0 +1,308 @@
+import re
+import warnings
+from collections.abc import Callable, Iterator
+from contextlib import ExitStack, contextmanager
+from threading import local
+from time import perf_counter
+from typing import Any, NamedTuple, Unpack
+
+from django.db import connections
+
+from picomet.parser import get_spans
+from picomet.transformer import (
+    LoopKwargs,
+    Mode,
+    SforKwargs,
+    Transformer,
+    TransformKwargs,
+)
+from picomet.types import (
+    Ast,
+    AstElement,
+    AstMap,
+    AstNode,
+    ElementDoubleTag,
+    Loops,
+    isNodeElement,
+    isNodeWithChildren,
+)
+
+placeholders_re = re.compile(r"\((?:%s, )+%s\)")
+
+# the comets already warned about
+unlocated: set[str] = set()
+
+
+class Query(NamedTuple):
+    sql: str
+    # the comet and the index of the element whose expression ran the query
+    path: str
+    element: int
+    # the loc and iteration of every s-for the query ran in, outermost first
+    loops: tuple[tuple[str, int], ...]
+    duration: float
+
+
+class RepeatedQuery(NamedTuple):
+    sql: str
+    queries: int
+    iterations: int
+    loop: str
+    sources: list[str]
+
+
+def get_shape(sql: str) -> str:
+    """sql with its IN lists collapsed, the parameters are already out of it."""
+    return placeholders_re.sub("(%s, ...)", sql)
+
+
+def warn_unlocated(path: str) -> None:
+    """
+    Warn once that the queries of path can't be located in it, built comets
+    carry neither the spans nor the element indexes of the dev cache.
+    """
+    if path not in unlocated:
+        unlocated.add(path)
+        warnings.warn(
+            f"{path} has no element spans, its queries are only attributed to "
+            "the comet. Query reports need DEBUG and comets parsed by the dev "
+            "server or the tests, not loaded from the build.",
+            RuntimeWarning,
+            stacklevel=3,
+        )
+
+
+def get_location(path: str, index: int) -> str:
+    spans = get_spans(path)
+    if spans and 0 <= index < len(spans):
+        row, col = spans[index][0][:2]
+        return f"{path}:{row + 1}:{col + 1}"
+    return path
+
+
+class QueryReport:
+    """The queries run while rendering comets, attributed to their elements."""
+
+    def __init__(self) -> None:
+        self.queries: list[Query] = []
+        # the comet and the element index of every s-for by loc
+        self.loops: dict[str, tuple[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    def repeated(self, threshold: int = 2) -> list[RepeatedQuery]:
+        """
+        The query shapes run in at least threshold iterations of the same s-for,
+        each of them is an N+1.
+        """
+        groups: dict[tuple[str, str], list[Query]] = {}
+        for query in self.queries:
+            if query.loops:
+                loc = query.loops[-1][0]
+                groups.setdefault((loc, get_shape(query.sql)), []).append(query)
+        repeated: list[RepeatedQuery] = []
+        for (loc, shape), queries in groups.items():
+            iterations = len({query.loops[-1] for query in queries})
+            if iterations >= threshold:
+                repeated.append(
+                    RepeatedQuery(
+                        shape,
+                        len(queries),
+                        iterations,
+                        get_location(*self.loops[loc]),
+                        sorted(
+                            {
+                                get_location(query.path, query.element)
+                                for query in queries
+                            }
+                        ),
+                    )
+                )
+        return repeated
+
+    def summary(self) -> str:
+        repeated = self.repeated()
+        duration = sum(query.duration for query in self.queries)
+        return (
+            f"{len(self.queries)} queries in {duration * 1000:.1f}ms, "
+            f"{sum(r.queries for r in repeated)} repeated in loops"
+        )
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "summary": self.summary(),
+            "queries": [
+                {
+                    "sql": query.sql,
+                    "source": get_location(query.path, query.element),
+                    "loops": [
+                        [get_location(*self.loops[loc]), iteration]
+                        for loc, iteration in query.loops
+                    ],
+                    "duration": query.duration,
+                }
+                for query in self.queries
+            ],
+            "repeated": [repeated._asdict() for repeated in self.repeated()],
+        }
+
+
+reports = local()
+
+
+def get_report() -> QueryReport | None:
+    return getattr(reports, "current", None)
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryReport]:
+    """Collect the queries run by the comets rendered in this thread."""
+    previous = get_report()
+    report = reports.current = QueryReport()
+    try:
+        yield report
+    finally:
+        reports.current = previous
+
+
+@contextmanager
+def assert_no_repeated_queries(threshold: int = 2) -> Iterator[QueryReport]:
+    """Fail when a query runs in threshold iterations of an s-for or more."""
+    with capture_queries() as report:
+        yield report
+    repeated = report.repeated(threshold)
+    if repeated:
+        raise AssertionError(
+            "\n".join(
+                f"{r.sql!r} ran {r.queries} times in {r.iterations} iterations "
+                f"of {r.loop} from {', '.join(r.sources)}"
+                for r in repeated
+            )
+        )
+
+
+class Frame:
+    __slots__ = ("loc", "iteration")
+
+    def __init__(self, loc: str):
+        self.loc = loc
+        self.iteration = -1
+
+
+class QueryTransformer(Transformer):
+    """
+    A transformer recording the comet, element and s-for iterations behind
+    every query its expressions run.
+    """
+
+    def __init__(
+        self,
+        ast: Ast | ElementDoubleTag,
+        map: AstMap,
+        context: dict[str, Any],
+        targets: list[str],
+        keys: Loops,
+        report: QueryReport,
+        path: str,
+    ):
+        super().__init__(ast, map, context, targets, keys)
+        if get_spans(path) is None:
+            warn_unlocated(path)
+        self.report = report
+        self.paths: list[str] = [path]
+        self.index = -1
+        self.frames: list[Frame] = []
+        self.pending: Frame | None = None
+
+    def transform(self) -> None:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self.execute))
+            super().transform()
+
+    def execute(
+        self,
+        execute: Callable[..., Any],
+        sql: str,
+        params: Any,
+        many: bool,
+        context: dict[str, Any],
+    ) -> Any:
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.report.queries.append(
+                Query(
+                    sql,
+                    self.paths[-1],
+                    self.index,
+                    tuple(
+                        (frame.loc, frame.iteration)
+                        for frame in self.frames
+                        # s-in runs before the first iteration
+                        if frame.iteration >= 0
+                    ),
+                    perf_counter() - start,
+                )
+            )
+
+    def _transform(
+        self,
+        node: AstNode,
+        loc: str,
+        depth: int | None = None,
+        prevRtrn: bool | None = None,
+        mode: Mode = "client",
+        **kwargs: Unpack[TransformKwargs],
+    ) -> bool | None:
+        if not isNodeElement(node):
+            return super()._transform(node, loc, depth, prevRtrn, mode, **kwargs)
+        paths, index = self.paths, self.index
+        if isNodeWithChildren(node) and node.file:
+            self.paths = [*paths, node.file]
+        elif node.tag == "Children" and len(paths) > 1:
+            # the children passed to a component belong to the comet including it
+            self.paths = paths[:-1]
+        self.index = node.index
+        try:
+            return super()._transform(node, loc, depth, prevRtrn, mode, **kwargs)
+        finally:
+            self.paths, self.index = paths, index
+
+    def handle_sfor(
+        self,
+        node: Ast | ElementDoubleTag,
+        children: list[AstNode],
+        loc: str,
+        loops: list[tuple[str, int]],
+        **kwargs: Unpack[SforKwargs],
+    ) -> bool | None:
+        self.report.loops.setdefault(loc, (self.paths[-1], node.index))
+        frame = Frame(loc)
+        self.frames.append(frame)
+        pending, self.pending = self.pending, frame
+        try:
+            return super().handle_sfor(node, children, loc, loops, **kwargs)
+        finally:
+            self.frames.pop()
+            self.pending = pending
+
+    def loop(
+        self,
+        children: list[AstNode] | list[AstElement],
+        loc: str,
+        depth: int | None = None,
+        loops: list[tuple[str, int]] = [],
+        **kwargs: Unpack[LoopKwargs],
+    ) -> None:
+        # handle_sfor loops over the children once per item
+        frame = self.pending
+        if frame is not None:
+            frame.iteration += 1
+            self.pending = None
+        try:
+            super().loop(children, loc, depth, loops, **kwargs)
+        finally:
+            self.pending = frame
@@ -0,0 +1,112 @@
+import os
+from collections.abc import Callable
+from itertools import chain
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.template import engines
+
+SKIP_DIRS = ["node_modules", "__pycache__"]
+
+
+def get_comet_dirs() -> list[str]:
+    return list(
+        chain.from_iterable(
+            [
+                [str(d) for d in loader.get_dirs()]
+                for loader in engines["picomet"].engine.template_loaders
+            ]
+        )
+    )
+
+
+def get_asset_dirs() -> list[str]:
+    return [
+        *[str(d) for d in getattr(settings, "ASSETFILES_DIRS", [])],
+        *[os.path.join(app.path, "assets") for app in apps.get_app_configs()],
+    ]
+
+
+class Resolver:
+    """
+    An index of the files under a list of directories by their name relative
+    to the first directory containing them. It is built on the first lookup
+    and the file watcher keeps it current with ``add`` and ``remove``. A name
+    missing from the index is looked up on disk.
+    """
+
+    __slots__ = ("get_dirs", "_dirs", "_index")
+
+    def __init__(self, get_dirs: Callable[[], list[str]]):
+        self.get_dirs = get_dirs
+        self._dirs: list[str] | None = None
+        self._index: dict[str, str] | None = None
+
+    @property
+    def dirs(self) -> list[str]:
+        if self._dirs is None:
+            self._dirs = self.get_dirs()
+        return self._dirs
+
+    @property
+    def index(self) -> dict[str, str]:
+        if self._index is None:
+            index: dict[str, str] = {}
+            for d in self.dirs:
+                for root, dirnames, filenames in os.walk(d):
+                    dirnames[:] = [
+                        name
+                        for name in dirnames
+                        if name not in SKIP_DIRS and not name.startswith(".")
+                    ]
+                    for filename in filenames:
+                        path = Path(root, filename)
+                        index.setdefault(
+                            path.relative_to(d).as_posix(), path.as_posix()
+                        )
+            self._index = index
+        return self._index
+
+    def clear(self) -> None:
+        self._dirs = None
+        self._index = None
+
+    def find(self, name: str) -> str | None:
+        path = self.index.get(name)
+        if path is None:
+            path = self.find_on_disk(name)
+        return path
+
+    def find_on_disk(self, name: str) -> str | None:
+        for d in self.dirs:
+            directory = Path(d)
+            if directory.is_dir():
+                file = directory / name
+                if file.exists():
+                    return file.as_posix()
+        return None
+
+    def name(self, path: str) -> str | None:
+        """The name path is found by, if it is under one of the directories."""
+        for d in self.dirs:
+            if path.startswith(os.path.join(d, "")):
+                return path[len(d) + 1 :]
+        return None
+
+    def add(self, path: str) -> None:
+        name = self.name(path)
+        if name is not None and self._index is not None:
+            self._index[Path(name).as_posix()] = self.find_on_disk(name) or path
+
+    def remove(self, path: str) -> None:
+        name = self.name(path)
+        if name is not None and self._index is not None:
+            name = Path(name).as_posix()
+            self._index.pop(name, None)
+            if found := self.find_on_disk(name):
+                self._index[name] = found
+
+
+comets = Resolver(get_comet_dirs)
+assets = Resolver(get_asset_dirs)
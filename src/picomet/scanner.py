@@ -0,0 +1,169 @@
+import re
+from bisect import bisect_left
+from typing import Literal, NamedTuple, cast
+
+type Delimiter = Literal["{$", "{{", "{%"]
+
+CLOSINGS: dict[str, str] = {"{$": "$}", "{{": "}}", "{%": "%}"}
+
+opening_re = re.compile(r"{[$%{]")
+interpolation_res: dict[str, re.Pattern[str]] = {
+    # possessive quantifiers never backtrack, so a failed match costs no more
+    # than the text it scanned
+    opening: re.compile(
+        rf"{re.escape(opening)}\s*+("
+        r"(?:\"[^\"\\]*+(?:\\[\s\S][^\"\\]*+)*+\"|'[^'\\]*+(?:\\[\s\S][^'\\]*+)*+'"
+        rf"|[^\"'\n{re.escape(closing[0])}]++|{re.escape(closing[0])}(?!{re.escape(closing[1])}))*+"
+        rf")\s*+{re.escape(closing)}"
+    )
+    for opening, closing in CLOSINGS.items()
+}
+ws_re = re.compile(r"\s*")
+# every position where a scan outside of a quoted string stops, lookaheads so
+# that overlapping closings like "}}}" stop at each position
+stop_res: dict[str, re.Pattern[str]] = {
+    closing: re.compile(rf"(?=[\"'\n]|{re.escape(closing)})")
+    for closing in CLOSINGS.values()
+}
+
+
+class Interpolation(NamedTuple):
+    delimiter: Delimiter
+    start: int
+    end: int
+    expression: str
+
+
+class ScanError(NamedTuple):
+    message: str
+    offset: int
+
+
+class Unterminated(Exception):
+    def __init__(self, message: str, known: bool = False):
+        super().__init__(message)
+        self.message = message
+        # the scan started in the unquoted text of one that already failed
+        self.known = known
+
+
+class Scanner:
+    """
+    The stops of text for a closing, found once, and the stops from which a
+    scan already failed. A scan reaching one of them outside of a quoted
+    string goes through the same stops after it, so it fails the same way
+    without scanning them again.
+    """
+
+    __slots__ = ("text", "closing", "stops", "failed")
+
+    def __init__(self, text: str, closing: str):
+        self.text = text
+        self.closing = closing
+        self.stops = [m.start() for m in stop_res[closing].finditer(text)]
+        self.failed: dict[int, str] = {}
+
+    def next_stop(self, position: int) -> int:
+        i = bisect_left(self.stops, position)
+        return self.stops[i] if i < len(self.stops) else len(self.text)
+
+    def scan(self, position: int) -> tuple[int, int]:
+        text, closing, failed = self.text, self.closing, self.failed
+        start = position
+        visited: list[int] = []
+        try:
+            while True:
+                position = self.next_stop(position)
+                if position in failed:
+                    raise Unterminated(failed[position], known=not visited)
+                visited.append(position)
+                if position == len(text):
+                    raise Unterminated(f"missing '{closing}'")
+                char = text[position]
+                if char == '"' or char == "'":
+                    position = find_quote_end(text, position)
+                    if position == -1:
+                        raise Unterminated("unterminated string")
+                    continue
+                content_end = start + len(text[start:position].rstrip())
+                if char == "\n":
+                    run_end = skip_whitespace(text, position)
+                    if not text.startswith(closing, run_end):
+                        raise Unterminated(f"missing '{closing}'")
+                    end = run_end + len(closing)
+                else:
+                    end = position + len(closing)
+                return content_end, end
+        except Unterminated as e:
+            for stop in visited:
+                failed[stop] = e.message
+            raise
+
+
+def scan(text: str) -> tuple[list[Interpolation], list[ScanError]]:
+    """
+    Find every ``{$ $}``, ``{{ }}`` and ``{% %}`` interpolation in text in
+    linear time. Quoted strings may contain the closing delimiter, an
+    interpolation ends at the first line break outside of a quoted string and
+    unterminated ``{$`` interpolations are reported as errors.
+    """
+    interpolations: list[Interpolation] = []
+    errors: list[ScanError] = []
+    scanners: dict[str, Scanner] = {}
+    position = 0
+    while opening_match := opening_re.search(text, position):
+        index = opening_match.start()
+        opening = opening_match.group()
+        position = index + 1
+        scanner = scanners.get(opening)
+        # a failed match scans to the end of the text, so the openings after
+        # the first failure of their kind only use the scanner
+        match = interpolation_res[opening].match(text, index) if not scanner else None
+        if match:
+            end, expression = match.end(), match.group(1).rstrip()
+        else:
+            if scanner is None:
+                scanner = scanners[opening] = Scanner(text, CLOSINGS[opening])
+            start = skip_whitespace(text, index + 2)
+            try:
+                expression_end, end = scanner.scan(start)
+            except Unterminated as e:
+                if opening == "{$" and not e.known:
+                    errors.append(ScanError(e.message, index))
+                continue
+            expression = text[start:expression_end]
+        interpolations.append(
+            Interpolation(cast(Delimiter, opening), index, end, expression)
+        )
+        position = end
+    return interpolations, errors
+
+
+def find_quote_end(text: str, position: int) -> int:
+    quote = text[position]
+    index = position + 1
+    while True:
+        index = text.find(quote, index)
+        if index == -1:
+            return -1
+        backslashes = 0
+        while text[index - 1 - backslashes] == "\\":
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return index + 1
+        index += 1
+
+
+def skip_whitespace(text: str, position: int) -> int:
+    return cast(re.Match[str], ws_re.match(text, position)).end()
+
+
+def get_position(text: str, offset: int, row: int = 0, col: int = 0) -> tuple[int, int]:
+    """
+    Return the (row, col) of offset in text, relative to the (row, col) of the
+    start of text.
+    """
+    lines = text.count("\n", 0, offset)
+    if lines:
+        return row + lines, offset - text.rfind("\n", 0, offset) - 1
+    return row, col + offset
@@ -0,0 +1,135 @@
+import atexit
+import sqlite3
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+BASE_DIR: Path = settings.BASE_DIR
+
+# the kinds of rows read all at once when the dev server starts
+STARTUP_KINDS = ("fhash", "fstat", "asset", "dgraph", "twlayout")
+
+
+class Store:
+    """
+    The dev cache, rows of ``(kind, key, value)`` in a SQLite database in WAL
+    mode. Writes are held for ``delay`` seconds and committed together, reads
+    see them right away.
+    """
+
+    def __init__(self, path: Path, delay: float = 0.05):
+        self.path = path
+        self.delay = delay
+        self.lock = threading.RLock()
+        self.connection: sqlite3.Connection | None = None
+        self.pending: dict[tuple[str, str], str | None] = {}
+        self.timer: threading.Timer | None = None
+        self.snapshot: dict[str, dict[str, str]] | None = None
+        atexit.register(self.flush)
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, check_same_thread=False, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (kind, key)) WITHOUT ROWID"
+            )
+            self.connection = connection
+        return self.connection
+
+    def load(self) -> dict[str, dict[str, str]]:
+        """The rows of the STARTUP_KINDS by kind, read with a single query."""
+        with self.lock:
+            if self.snapshot is None:
+                self.snapshot = {kind: {} for kind in STARTUP_KINDS}
+                if self.path.exists():
+                    rows = self.connect().execute(
+                        "SELECT kind, key, value FROM cache WHERE kind IN "
+                        f"({', '.join('?' * len(STARTUP_KINDS))})",
+                        STARTUP_KINDS,
+                    )
+                    for kind, key, value in rows:
+                        self.snapshot[kind][key] = value
+            return self.snapshot
+
+    def get(self, kind: str, key: str) -> str | None:
+        with self.lock:
+            if (kind, key) in self.pending:
+                return self.pending[kind, key]
+            row = (
+                self.connect()
+                .execute(
+                    "SELECT value FROM cache WHERE kind = ? AND key = ?", (kind, key)
+                )
+                .fetchone()
+            )
+        return row[0] if row else None
+
+    def has(self, kind: str, key: str) -> bool:
+        with self.lock:
+            if (kind, key) in self.pending:
+                return self.pending[kind, key] is not None
+            row = (
+                self.connect()
+                .execute("SELECT 1 FROM cache WHERE kind = ? AND key = ?", (kind, key))
+                .fetchone()
+            )
+        return row is not None
+
+    def set(self, kind: str, key: str, value: str | None) -> None:
+        """Write value, or delete the row when it is None."""
+        with self.lock:
+            self.pending[kind, key] = value
+            if self.timer is None:
+                self.timer = threading.Timer(self.delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def delete(self, kind: str, key: str) -> None:
+        self.set(kind, key, None)
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            pending, self.pending = self.pending, {}
+            if not pending:
+                return
+            connection = self.connect()
+            connection.execute("BEGIN")
+            try:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO cache (kind, key, value) VALUES (?, ?, ?)",
+                    [(k, key, v) for (k, key), v in pending.items() if v is not None],
+                )
+                connection.executemany(
+                    "DELETE FROM cache WHERE kind = ? AND key = ?",
+                    [(k, key) for (k, key), v in pending.items() if v is None],
+                )
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def close(self) -> None:
+        """Drop the pending writes and close the database before removing it."""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            self.pending.clear()
+            self.snapshot = None
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+store = Store(BASE_DIR / ".picomet" / "cache" / "cache.sqlite3")
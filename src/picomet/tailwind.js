@@ -5,30 +5,68 @@ const fs = require("fs");
 const crypto = require("crypto");
 const path = require("path");
 
+/** @type {Object<string, {mtime: number, value: any}>} */
+const files = {};
+
+/** @type {Object<string, {key: string, processor: any}>} */
+const processors = {};
+
 /**
- * @async
- * @param {string} inputCss
+ * Require a module again only once its file changed.
+ * @param {string} file
+ * @returns {any}
+ */
+function load(file) {
+  const mtime = fs.statSync(file).mtimeMs;
+  const cached = files[file];
+  if (cached && cached.mtime === mtime) {
+    return cached.value;
+  }
+  delete require.cache[require.resolve(file)];
+  const value = require(file);
+  files[file] = { mtime, value };
+  return value;
+}
+
+/**
+ * Read a file again only once it changed.
+ * @param {string} file
+ * @returns {string}
+ */
+function read(file) {
+  const mtime = fs.statSync(file).mtimeMs;
+  const cached = files[file];
+  if (cached && cached.mtime === mtime) {
+    return cached.value;
+  }
+  const value = fs.readFileSync(file).toString();
+  files[file] = { mtime, value };
+  return value;
+}
+
+/**
+ * The postcss pipeline of a layout, built again once its configs or content
+ * files change.
  * @param {string} tailwindConf
  * @param {string} postcssConf
- * @param {string} destDir
  * @param {string} id
  * @param {string[]} content
  * @param {boolean} DEBUG
- * @returns {string[]}
+ * @returns {any}
  */
-async function compile(
-  inputCss,
-  tailwindConf,
-  postcssConf,
-  destDir,
-  id,
-  content,
-  DEBUG,
-) {
-  const css = fs.readFileSync(inputCss);
-  const twConfig = require(tailwindConf);
-  twConfig.content = content;
-  const plugins = require(postcssConf).plugins;
+function getProcessor(tailwindConf, postcssConf, id, content, DEBUG) {
+  const twConfig = { ...load(tailwindConf), content };
+  const plugins = [...load(postcssConf).plugins];
+  const key = [
+    files[tailwindConf].mtime,
+    files[postcssConf].mtime,
+    DEBUG,
+    ...content,
+  ].join("\n");
+  const cached = processors[id];
+  if (cached && cached.key === key) {
+    return cached.processor;
+  }
   for (let plugin in plugins) {
     if (
       typeof plugins[plugin] === "function" &&
@@ -47,7 +85,34 @@ async function compile(
       // eslint-disable-next-line no-empty
     } catch (e) {}
   }
-  const result = await postcss(plugins).process(css, { from: undefined });
+  const processor = postcss(plugins);
+  processors[id] = { key, processor };
+  return processor;
+}
+
+/**
+ * @async
+ * @param {string} inputCss
+ * @param {string} tailwindConf
+ * @param {string} postcssConf
+ * @param {string} destDir
+ * @param {string} id
+ * @param {string[]} content
+ * @param {boolean} DEBUG
+ * @returns {Promise<[string, string, string, number]>}
+ */
+async function compile(
+  inputCss,
+  tailwindConf,
+  postcssConf,
+  destDir,
+  id,
+  content,
+  DEBUG,
+) {
+  const css = read(inputCss);
+  const processor = getProcessor(tailwindConf, postcssConf, id, content, DEBUG);
+  const result = await processor.process(css, { from: undefined });
   const hash = crypto
     .createHash("md5")
     .update(result.css)
@@ -63,7 +128,7 @@ async function compile(
   }
 
   fs.writeFileSync(dest, result.css);
-  return [css.toString(), fname, result.css];
+  return [css, fname, hash, Buffer.byteLength(result.css)];
 }
 
 module.exports = { compile };
@@ -1,3 +1,170 @@
-from django.test import TestCase  # noqa: F401
+from pathlib import Path
+from typing import Any
+from unittest import mock
 
-# Create your tests here.
+from django.template import engines
+from django.test import SimpleTestCase
+from htmst.structures import (
+    AttrNode,
+    CommentNode,
+    DoctypeNode,
+    DoubleTagNode,
+    SingleTagNode,
+    TextNode,
+)
+
+from picomet.graph import DependencyGraph
+from picomet.needs import RecordingContext, needs, needs_cache, template_names
+from picomet.tokenizers import TOKENIZERS
+from picomet.types import (
+    Ast,
+    AstAttr,
+    ElementDoubleTag,
+    ElementSingleTag,
+    StrCode,
+)
+from picomet.types import DoubleQuoteEscapedStr as DQES
+
+ROOT = Path(__file__).resolve().parent
+
+EDGE_CASES = [
+    "<!DOCTYPE html>\n<html  lang='en'>\n\t<body>text</body></html>",
+    '<div\n  class = "a"\n  s-show>\n</div  >',
+    "<img src='a.png' / ><br/><input disabled / >",
+    "<p>a < b</p><!-- a -- comment -->\n<!---->",
+    "<script>if (a < b) { s = '</script>' }\nx = `${a}` < 1</script>",
+    "<style>a[href='\\'}'] { color: red }</style>",
+    "<p s-text='it\\'s'>{$ f\"{a}\" $}</p>",
+    "<div a=b>unquoted</div>",
+    "line\r\nbreaks\r\n<p\r\n>x</p>",
+    "<div><p>unclosed",
+    "<!-- unterminated",
+]
+
+
+def dump(node: Any) -> Any:
+    span = (node.start.row, node.start.col, node.end.row, node.end.col)
+    if isinstance(node, DoubleTagNode | SingleTagNode):
+        return (
+            type(node).__name__,
+            node.tag,
+            [dump(attr) for attr in node.attrs],
+            span,
+            [dump(child) for child in getattr(node, "children", [])],
+        )
+    elif isinstance(node, AttrNode):
+        return ("AttrNode", node.name, node.value, span)
+    elif isinstance(node, TextNode | CommentNode | DoctypeNode):
+        return (type(node).__name__, node.text, span)
+    raise TypeError(node)
+
+
+class TokenizerTests(SimpleTestCase):
+    def test_conformance(self) -> None:
+        sources = {f"<edge case {i}>": case for i, case in enumerate(EDGE_CASES)}
+        for directory in [ROOT / "template", ROOT.parent.parent / "example"]:
+            for path in sorted(directory.glob("**/comets/**/*.html*")):
+                if "node_modules" not in path.parts:
+                    sources[str(path)] = path.read_text()
+        reference = TOKENIZERS["htmst"]
+        for name, tokenizer in TOKENIZERS.items():
+            for key, source in sources.items():
+                with self.subTest(tokenizer=name, source=key):
+                    self.assertEqual(dump(tokenizer(source)), dump(reference(source)))
+
+    def test_lone_carriage_return(self) -> None:
+        # htmst swallows the char after a lone carriage return
+        source = "a\rb<p>x</p>"
+        text = TOKENIZERS["streaming"](source).children[0]
+        assert isinstance(text, TextNode)
+        self.assertEqual(text.text, "a\rb")
+        self.assertNotEqual(
+            dump(TOKENIZERS["streaming"](source)), dump(TOKENIZERS["htmst"](source))
+        )
+
+
+class TemplateNamesTests(SimpleTestCase):
+    def assert_conservative(self, source: str, **context: object) -> None:
+        template = engines["django"].from_string(source)
+        recording = RecordingContext(context)
+        template.render(recording)
+        self.assertLessEqual(recording.read, template_names(template))
+
+    def test_filter_arguments(self) -> None:
+        template = engines["django"].from_string("{{ a|default:b }}")
+        self.assertEqual(template_names(template), {"a", "b"})
+        self.assert_conservative("{{ a|default:b }}", a=None, b=1)
+        self.assert_conservative("{{ a|add:b.c|default:'d' }}", a=1, b={"c": 2})
+
+    def test_literal_arguments(self) -> None:
+        template = engines["django"].from_string("{{ 'a'|default:\"b\"|add:3 }}")
+        self.assertEqual(template_names(template), set())
+
+
+def element(tag: str, children: list[Any] | None = None, **attrs: str) -> Any:
+    pairs = [AstAttr(k.replace("_", "-"), DQES(v)) for k, v in attrs.items()]
+    if children is None:
+        return ElementSingleTag(tag, pairs)
+    return ElementDoubleTag(tag, pairs, children)
+
+
+COMETS: dict[str, Ast] = {
+    "Base": element(
+        "Fragment",
+        [
+            element(
+                "main",
+                [
+                    StrCode("title", "Base"),
+                    element("Outlet", [element("Children")], layout="base"),
+                ],
+            )
+        ],
+    ),
+    "Card": element(
+        "Fragment", [element("div", [element("Children")], s_group="card")]
+    ),
+    "Page": element(
+        "Fragment",
+        [
+            element(
+                "Layout",
+                [
+                    element("Include", [StrCode("blogs", "Page")], **{"@": "Card"}),
+                    StrCode("user", "Page"),
+                ],
+                **{"@": "Base"},
+            )
+        ],
+    ),
+}
+
+
+def get_comet(name: str) -> tuple[str, Ast]:
+    return name, COMETS[name]
+
+
+@mock.patch("picomet.needs.get_comet", get_comet)
+class NeedsTests(SimpleTestCase):
+    def setUp(self) -> None:
+        needs_cache.clear()
+
+    def test_outlet(self) -> None:
+        # the page body is rendered in the outlet of its layout
+        self.assertTrue(needs("Page", ["+base"], "blogs"))
+        self.assertTrue(needs("Page", ["+base"], "user"))
+        self.assertTrue(needs("Page", ["+base"], "title"))
+
+    def test_children(self) -> None:
+        # the children passed to a component are rendered in its groups
+        self.assertTrue(needs("Page", ["&card"], "blogs"))
+
+
+class DependencyGraphTests(SimpleTestCase):
+    def test_sort_through_unlisted_component(self) -> None:
+        graph = DependencyGraph()
+        # a depends on b which depends on c, b is not in the batch
+        graph.add("c", "b")
+        graph.add("b", "a")
+        self.assertEqual(graph.sort(["a", "c"]), ["c", "a"])
+        self.assertEqual(graph.sort(["a", "b", "c"]), ["c", "b", "a"])
@@ -0,0 +1,310 @@
+import re
+from collections.abc import Callable
+from typing import cast
+
+from django.utils.module_loading import import_string
+from htmst import HtmlAst
+from htmst.structures import (
+    AttrNode,
+    CommentNode,
+    DoctypeNode,
+    DoubleTagNode,
+    Pos,
+    SingleTagNode,
+    TextNode,
+)
+
+type Tokenizer = Callable[[str], DoubleTagNode]
+
+SOURCES = ["script", "style"]
+
+CLOSINGS: dict[str, tuple[str, str | None, str]] = {
+    "(": (")", None, "({[\"'`"),
+    "{": ("}", None, "({[\"'`"),
+    "[": ("]", None, "({[\"'`"),
+    '"': ('"', "\\", ""),
+    "'": ("'", "\\", ""),
+    "`": ("`", "\\", ""),
+}
+
+ws_re = re.compile(r"\s*")
+tag_name_re = re.compile(r"[a-zA-Z0-9.-]+")
+attr_name_re = re.compile(r"[a-zA-Z0-9@:_.-]+")
+doctype_name_re = re.compile(r"[a-zA-Z0-9]+")
+doctype_re = re.compile(r"![dD][oO][cC][tT][yY]")
+tag_tail_re = re.compile(r"[>/]")
+source_re = re.compile(r"[({\[\"'`<]")
+until_res = {
+    start: re.compile(f"[{re.escape(nested + closing)}]")
+    for start, (closing, escape, nested) in CLOSINGS.items()
+}
+
+
+def htmst(source: str) -> DoubleTagNode:
+    return HtmlAst(source).root
+
+
+def streaming(source: str) -> DoubleTagNode:
+    return StreamingTokenizer(source).root
+
+
+TOKENIZERS: dict[str, Tokenizer] = {"htmst": htmst, "streaming": streaming}
+
+
+def get_tokenizer(name: str) -> Tokenizer:
+    if name in TOKENIZERS:
+        return TOKENIZERS[name]
+    return import_string(name)
+
+
+def make_pos(row: int, col: int) -> Pos:
+    pos = Pos.__new__(Pos)
+    pos.row = row
+    pos.col = col
+    return pos
+
+
+class StreamingTokenizer:
+    """
+    A drop in replacement of ``htmst.HtmlAst`` producing the same nodes, spans
+    and attrs. Instead of matching a regex against every char, it jumps from
+    one significant char to the next and only counts line breaks in between.
+    A lone carriage return is kept as a line break instead of swallowing the
+    char after it.
+    """
+
+    __slots__ = ("html", "root", "current_node", "index", "row", "col")
+
+    def __init__(self, html: str):
+        self.html: str = html
+        self.root = DoubleTagNode("", [], None, make_pos(0, 0), make_pos(0, 0))
+        self.current_node: DoubleTagNode = self.root
+        self.index = 0
+        self.row = 0
+        self.col = 0
+        self.parse()
+        self.root.end = self.pos()
+
+    def parse(self) -> None:
+        html = self.html
+        length = len(html)
+        while self.index < length:
+            index = self.index
+            if html[index] == "<":
+                if html.startswith("!--", index + 1):
+                    self.handle_comment()
+                elif doctype_re.match(html, index + 1):
+                    self.handle_doctype()
+                elif html.startswith("/", self.skip_ws_from(index + 1)):
+                    self.handle_tag_end()
+                else:
+                    self.handle_tag_start()
+            else:
+                self.handle_text()
+
+    def pos(self) -> Pos:
+        return make_pos(self.row, self.col)
+
+    def skip_ws_from(self, index: int) -> int:
+        if index >= len(self.html):
+            return index
+        return ws_re.match(self.html, index).end()  # type: ignore[union-attr]
+
+    def advance(self, to: int) -> None:
+        """Move to index, counting line breaks like ``htmst`` ``skip_any``."""
+        html = self.html
+        newlines = html.count("\n", self.index, to)
+        if newlines:
+            self.row += newlines
+            self.col = to - html.rfind("\n", self.index, to) - 1
+        else:
+            self.col += to - self.index
+        self.index = to
+
+    def skip(self, to: int) -> None:
+        """Move to index like ``htmst`` ``skip_char`` and ``skip_whitespaces``."""
+        self.col += to - self.index
+        self.index = to
+
+    def skip_ws(self) -> None:
+        self.skip(self.skip_ws_from(self.index))
+
+    def until(self, start: str, index: int) -> int:
+        """Return the index of the char closing start, like ``htmst``."""
+        html = self.html
+        length = len(html)
+        stack = [start]
+        while stack and index < length:
+            closing, escape, nested = CLOSINGS[stack[-1]]
+            match = until_res[stack[-1]].search(html, index)
+            if match is None:
+                return length
+            index = match.start()
+            char = html[index]
+            if char in nested:
+                stack.append(char)
+            elif escape and html[index - 1] == escape:
+                pass
+            else:
+                stack.pop()
+                if not stack:
+                    return index
+            index += 1
+        return min(index, length)
+
+    def text(self, start: int, end: int) -> str:
+        text = self.html[start:end]
+        if "\r\n" in text:
+            text = text.replace("\r\n", "\r")
+        return text
+
+    def handle_text(self) -> None:
+        html = self.html
+        length = len(html)
+        start = self.index
+        start_pos = self.pos()
+        if self.current_node.tag in SOURCES:
+            index = start
+            while index < length:
+                match = source_re.search(html, index)
+                if match is None:
+                    index = length
+                    break
+                index = match.start()
+                char = html[index]
+                if char == "<":
+                    break
+                index = self.until(char, index + 1) + 1
+            end = min(index, length)
+        else:
+            end = html.find("<", start)
+            if end == -1:
+                end = length
+        self.advance(end)
+        self.current_node.children.append(
+            TextNode(self.text(start, end), self.current_node, start_pos, self.pos())
+        )
+
+    def handle_tag_start(self) -> None:
+        html = self.html
+        length = len(html)
+        tag_start = self.pos()
+        self.skip(self.index + 1)  # <
+        self.skip_ws()
+        tag = self.match(tag_name_re)
+        self.skip_ws()
+
+        attrs: list[AttrNode] = []
+        while self.index < length:
+            attr_start = self.pos()
+            name = self.match(attr_name_re)
+            if not name:
+                break
+            self.skip_ws()
+            value: str | None = None
+            if html.startswith("=", self.index):
+                self.advance(self.index + 1)
+                self.skip_ws()
+                quote = html[self.index : self.index + 1]
+                if quote != '"' and quote != "'":
+                    break
+                start = self.index + 1
+                end = self.until(quote, start)
+                self.advance(end)
+                value = self.text(start, end)
+                self.skip(self.index + 1)  # quote
+            attrs.append(AttrNode(name, value, attr_start, self.pos()))
+            self.skip_ws()
+
+        while self.index < length:
+            match = tag_tail_re.search(html, self.index)
+            if match is None:
+                self.advance(length)
+                return
+            self.advance(match.start())
+            if match.group() == ">":
+                self.skip(self.index + 1)
+                node = DoubleTagNode(
+                    # None like htmst when the name runs into the end
+                    cast(str, tag),
+                    attrs,
+                    self.current_node,
+                    tag_start,
+                    make_pos(0, 0),
+                )
+                self.current_node.children.append(node)
+                self.current_node = node
+                return
+            self.skip(self.index + 1)  # /
+            self.skip_ws()
+            end = html.find(">", self.index)
+            if end == -1:
+                self.advance(length)
+                return
+            self.advance(end + 1)
+            self.current_node.children.append(
+                SingleTagNode(
+                    cast(str, tag),
+                    attrs,
+                    self.current_node,
+                    tag_start,
+                    self.pos(),
+                )
+            )
+            return
+
+    def match(self, regex: re.Pattern[str]) -> str | None:
+        match = regex.match(self.html, self.index)
+        if match is None:
+            return None
+        self.skip(match.end())
+        if match.end() == len(self.html):
+            # htmst drops a name running into the end of the source
+            return None
+        return match.group()
+
+    def handle_tag_end(self) -> None:
+        self.skip(self.index + 1)  # <
+        self.skip_ws()
+        self.skip(self.index + 1)  # /
+        self.match(tag_name_re)
+        self.skip_ws()
+        end = self.html.find(">", self.index)
+        if end == -1:
+            self.advance(len(self.html))
+        else:
+            self.advance(end + 1)
+        self.current_node.end = self.pos()
+        if self.current_node.parent is not None:
+            self.current_node = self.current_node.parent
+
+    def handle_comment(self) -> None:
+        start = self.pos()
+        self.skip(self.index + 4)  # <!--
+        end = self.html.find("-->", self.index)
+        if end == -1:
+            text = self.text(self.index, len(self.html))
+            self.advance(len(self.html))
+        else:
+            text = self.text(self.index, end)
+            self.advance(end + 3)
+        self.current_node.children.append(
+            CommentNode(text, self.current_node, start, self.pos())
+        )
+
+    def handle_doctype(self) -> None:
+        start = self.pos()
+        self.skip(self.index + 9)  # <!doctype | <!DOCTYPE
+        self.skip_ws()
+        typ = self.match(doctype_name_re)
+        self.skip_ws()
+        if self.html.startswith(">", self.index):
+            self.skip(self.index + 1)
+        self.current_node.children.append(
+            DoctypeNode(
+                cast(str, typ),
+                self.current_node,
+                start,
+                self.pos(),
+            )
+        )
@@ -13,7 +13,8 @@ from django.template.backends.django import Template
 from django.utils.safestring import SafeString
 
 from picomet.helpers import get_url_id
-from picomet.parser import STATIC_URL, asset_cache, parse
+from picomet.lazy import unlazy
+from picomet.parser import STATIC_URL, asset_cache, read_asset
 from picomet.types import (
     Ast,
     AstAttr,
@@ -26,6 +27,7 @@ from picomet.types import (
     AstNode,
     ElementDoubleTag,
     EscapedAttrs,
+    Loc,
     Loops,
     StrCode,
     StrStore,
@@ -106,6 +108,17 @@ class SforKwargs(TypedDict):
     propChildren: list[list[AstNode]]
 
 
+def get_asset_url(node: AstElement, asset_name: str) -> tuple[DQES, DQES]:
+    """The id and url of a local asset, the build resolves the url ahead."""
+    url = get_atrb(node, "s-src")
+    if isinstance(url, str):
+        fname = url[len(STATIC_URL) :]
+    else:
+        fname = asset_cache[asset_name].fname
+        url = edq(f"{STATIC_URL}{fname}")
+    return edq(fname.split(".")[0]), DQES(url)
+
+
 class Transformer:
     def __init__(
         self,
@@ -140,13 +153,13 @@ class Transformer:
 
     def clean_targets(self) -> None:
         targets: list[str] = []
-        layoutLoc: list[int] = []
+        layoutLoc: Loc = ()
         layoutId: str | None = None
         for target in self.targets:
             if not target.startswith("+"):
                 targets.append(target)
             else:
-                loLoc = self.map["layouts"].get(target[1:], [])
+                loLoc = self.map["layouts"].get(target[1:], ())
                 if len(loLoc) > len(layoutLoc):
                     layoutLoc = loLoc
                     layoutId = target[1:]
@@ -166,7 +179,7 @@ class Transformer:
         store: dict[str, Any]
         reset: list[str]
         if isNodeElement(node):
-            tag = node["tag"]
+            tag = node.tag
             comet: str
             if isNodeWithChildren(node):
                 if tag in ["Layout", "Include"]:
@@ -176,13 +189,13 @@ class Transformer:
                         if not comet.endswith(".html"):
                             comet = f"{comet}.html"
                         template = loader.get_template(comet, using="picomet").template
-                        ast = parse(template.source, template.origin.name).ast
-                        withs, props = self.sort_props(node["attrs"])
+                        ast = template.bind()[0]
+                        withs, props = self.sort_props(node.attrs)
                         store, reset = {}, []
                         self.pack_with(withs, store, reset)
                         kwargs["propAttrs"] = props
                         kwargs.setdefault("propChildren", [])
-                        kwargs["propChildren"].append(node["children"])
+                        kwargs["propChildren"].append(node.children)
                         self._transform(ast, loc, depth, mode=mode, **kwargs)
                         self.reset_context(reset)
                         self.unpack_store(store)
@@ -194,8 +207,8 @@ class Transformer:
                     if not comet.endswith(".html"):
                         comet = f"{comet}.html"
                     template = loader.get_template(comet, using="picomet").template
-                    ast = parse(template.source, template.origin.name).ast
-                    withs, props = self.sort_props(node["attrs"])
+                    ast = template.bind()[0]
+                    withs, props = self.sort_props(node.attrs)
                     store, reset = {}, []
                     self.pack_with(withs, store, reset)
                     kwargs["propAttrs"] = props
@@ -212,18 +225,18 @@ class Transformer:
                 return None
             GROUPS = cast(str, get_atrb(node, "s-group", default=edq(""))).split(",")
             PARAMS = cast(str, get_atrb(node, "s-param", default=edq(""))).split(",")
-            tag = node["tag"]
+            tag = node.tag
             if (
                 any(f"&{group}" in self.targets for group in GROUPS)
                 or any(f"?{param}" in self.targets for param in PARAMS)
                 or (loc in self.targets)
-                or (f"${node.get('file')}" in self.targets)
+                or (isNodeWithChildren(node) and f"${node.file}" in self.targets)
                 or (tag == "Outlet" and f"+{get_atrb(node, "layout")}" in self.targets)
             ):
                 self.partials[loc] = {"html": "", "css": {}, "js": {}}
                 self.c_target = loc
             else:
-                attrs = AstAttrsDynamic(node["attrs"], kwargs["propAttrs"])
+                attrs = AstAttrsDynamic(node.attrs, kwargs["propAttrs"])
                 mode = cast(Mode, get_atrb(node, "mode", default=edq(mode)))
                 if mode == "server" and self.ctx is None:
                     self.ctx = MiniRacer()
@@ -236,7 +249,7 @@ class Transformer:
                         return condition
 
                     for attr in attrs:
-                        k, v, span = attr
+                        k, v = attr
                         if k == "s-context":
                             self.handle_scontext(v, store, reset)
                         elif k.startswith("s-prop:"):
@@ -248,12 +261,12 @@ class Transformer:
                 if tag == "html" and self.ctx:
                     self.ctx.eval("var isServer = true;")
                 elif tag == "With":
-                    self.pack_with(node["attrs"], store, reset)
+                    self.pack_with(node.attrs, store, reset)
                 elif tag == "Default":
-                    self.pack_defaults(node["attrs"], store, reset)
+                    self.pack_defaults(node.attrs, store, reset)
 
                 if isNodeWithChildren(node):
-                    children = node["children"]
+                    children = node.children
                     if sfor:
                         self.handle_sfor(
                             node, children, loc, depth=depth, mode=mode, **kwargs
@@ -292,13 +305,17 @@ class Transformer:
         mode = cast(Mode, get_atrb(node, "mode", default=edq(mode)))
         if mode == "server" and self.ctx is None:
             self.ctx = MiniRacer()
-        tag = node["tag"]
-        attrs = AstAttrsDynamic(node["attrs"], kwargs["propAttrs"])
+        tag = node.tag
+        attrs = AstAttrsDynamic(node.attrs, kwargs["propAttrs"])
         eattrs: EscapedAttrs = []
 
         text: str | None = None
         sfor = None
-        mark = (node.get("file") and not node.get("isBase")) if DEBUG else False
+        mark = (
+            (isNodeWithChildren(node) and bool(node.file) and not node.isBase)
+            if DEBUG
+            else False
+        )
         mark_attrs: EscapedAttrs = []
 
         store: dict[str, Any] = {}
@@ -316,7 +333,7 @@ class Transformer:
                 return condition
 
             for attr in attrs:
-                k, v, span = attr
+                k, v = attr
                 if not k.startswith("x-") and not k.startswith("s-") and k != "mode":
                     if isinstance(v, DQES):
                         eattrs.append((k, v))
@@ -324,7 +341,7 @@ class Transformer:
                         eattrs.append((k, v))
 
             for attr in attrs:
-                k, v, span = attr
+                k, v = attr
                 if k == "s-group" or k == "s-param":
                     mark = True
                 elif k == "x-form" and isinstance(v, str | type(None)):
@@ -337,7 +354,7 @@ class Transformer:
                     self.handle_sprop(k, v, eattrs, mode)
                 elif k.startswith("x-prop:"):
                     if isinstance(v, StrCode):
-                        value = dumps(eval(v.code, self.context))
+                        value = dumps(eval(v.code, self.context), default=unlazy)
                         eattrs.append((k, edq(value)))
                 elif k == "x-data" and isinstance(v, str):
                     eattrs.append((k, v))
@@ -376,7 +393,7 @@ class Transformer:
                     elif isinstance(v, StrCode):
                         value = eval(v.code, self.context)
                         if k.split(":")[1] == "x-prop":
-                            value = dumps(value)
+                            value = dumps(value, default=unlazy)
                         eattrs.append(
                             (
                                 ":".join(k.split(":")[1:]),
@@ -428,7 +445,7 @@ class Transformer:
                     eattrs.append(
                         (
                             k.split(":")[1],
-                            edq(f"{STATIC_URL}{asset_cache[str(v)][0]}"),
+                            edq(f"{STATIC_URL}{asset_cache[str(v)].fname}"),
                         )
                     )
                 elif k == "s-for":
@@ -451,37 +468,35 @@ class Transformer:
                 mark_attrs.append(("group", edq("layout")))
                 mark_attrs.append(("gId", edq(layout)))
         elif tag == "With":
-            self.pack_with(node["attrs"], store, reset)
+            self.pack_with(node.attrs, store, reset)
         elif tag == "Default":
-            self.pack_defaults(node["attrs"], store, reset)
+            self.pack_defaults(node.attrs, store, reset)
 
         if self.c_target:
             if tag == "Css" or tag == "Sass":
                 asset_name = get_atrb(node, "@")
                 if isinstance(asset_name, str):
-                    if not asset_name.startswith("http"):
-                        fname, _ = asset_cache[asset_name]
-                        path = f"{STATIC_URL}{fname}"
+                    partial = self.partials[self.c_target]["css"]
+                    if asset_name.startswith("http"):
+                        partial[get_url_id(asset_name)] = asset_name
                     else:
-                        fname = get_url_id(asset_name)
-                        path = asset_name
-                    self.partials[self.c_target]["css"][fname.split(".")[0]] = path
+                        asset_id, path = get_asset_url(node, asset_name)
+                        partial[asset_id] = path
             elif tag == "Js" or tag == "Ts":
                 asset_name = get_atrb(node, "@")
                 if isinstance(asset_name, str):
-                    if not asset_name.startswith("http"):
-                        fname, _ = asset_cache[asset_name]
-                        path = f"{STATIC_URL}{fname}"
+                    partial = self.partials[self.c_target]["js"]
+                    if asset_name.startswith("http"):
+                        partial[get_url_id(asset_name)] = asset_name
                     else:
-                        fname = get_url_id(asset_name)
-                        path = asset_name
-                    self.partials[self.c_target]["js"][fname.split(".")[0]] = path
+                        asset_id, path = get_asset_url(node, asset_name)
+                        partial[asset_id] = path
             else:
                 attributes = self.join_attrs(eattrs)
                 if mark:
                     self.add_marker_start(loc, mark_attrs)
                 if isNodeWithChildren(node):
-                    children = node["children"]
+                    children = node.children
                     if tag and (tag not in WRAPPERS):
                         self.partials[self.c_target]["html"] += f"<{tag}{attributes}>"
                     if sfor:
@@ -509,9 +524,7 @@ class Transformer:
                 asset_id = edq(get_url_id(asset_name))
                 href = asset_name
             else:
-                fname, compiled = asset_cache[asset_name]
-                asset_id = edq(fname.split(".")[0])
-                href = edq(f"{STATIC_URL}{fname}")
+                asset_id, href = get_asset_url(node, asset_name)
             group = self.groups[cast(str, get_atrb(node, "group", DQES("head")))]
             exists = False
             for asset in group["children"]:
@@ -523,7 +536,7 @@ class Transformer:
                         {
                             "tag": "style",
                             "attrs": [("data-style-id", asset_id)],
-                            "children": [compiled],
+                            "children": [read_asset(asset_cache[asset_name].fname)],
                             "parent": self.current,
                         }
                     )
@@ -545,9 +558,7 @@ class Transformer:
                 asset_id = edq(get_url_id(asset_name))
                 path = asset_name
             else:
-                fname, _ = asset_cache[asset_name]
-                asset_id = edq(fname.split(".")[0])
-                path = edq(f"{STATIC_URL}{fname}")
+                asset_id, path = get_asset_url(node, asset_name)
             remove_atrb(eattrs, "@")
             eattrs.append(("type", edq("module")))
             eattrs.append(("data-script-id", asset_id))
@@ -562,7 +573,7 @@ class Transformer:
                 }
             )
         elif tag == "Tailwind":
-            fname, _ = asset_cache[cast(str, get_atrb(node, "layout"))]
+            fname = asset_cache[cast(str, get_atrb(node, "layout"))].fname
             self.current["children"].append(
                 {
                     "tag": "link",
@@ -591,7 +602,7 @@ class Transformer:
                     group["children"] = []
                     self.groups[cast(str, group_name)] = group
             if isNodeWithChildren(node):
-                children = node["children"]
+                children = node.children
                 element = cast(EscElementDoubleTag, element)
                 if tag == "head":
                     self.groups[tag] = cast(EscGroupElement, element)
@@ -632,7 +643,7 @@ class Transformer:
         for index, child in enumerate(children):
             _depth: int = 0 if depth is None else depth + 1
             _loc: str = loc
-            if isNodeElement(child) and child["tag"] not in ["Layout", "Include"]:
+            if isNodeElement(child) and child.tag not in ["Layout", "Include"]:
                 _loc += f"{index}" if not _loc else f",{index}"
                 if (
                     len(self.targets)
@@ -682,9 +693,7 @@ class Transformer:
 
     def sort_props(self, attrs: AstAttrs) -> tuple[AstAttrs, AstAttrs]:
         withs = [
-            AstAttr(attr[0][1:], attr[1], attr[2])
-            for attr in attrs
-            if attr[0].startswith(".")
+            AstAttr(attr[0][1:], attr[1]) for attr in attrs if attr[0].startswith(".")
         ]
         props = [
             attr for attr in attrs if not (attr[0].startswith(".") or attr[0] == "@")
@@ -737,7 +746,7 @@ class Transformer:
     ) -> None:
         if isinstance(v, StrCode) and mode == "server" and self.ctx:
             prop = k.split(":")[1]
-            value = dumps(eval(v.code, self.context))
+            value = dumps(eval(v.code, self.context), default=unlazy)
             self.ctx.eval(f"var {prop} = JSON.parse('{value.replace("'","\\'")}');")
             if isinstance(attrs, list):
                 attrs.append((f"x-prop:{prop}", edq(value)))
@@ -774,6 +783,15 @@ class Transformer:
         store: dict[str, Any] = {}
         if sfor in self.context:
             store[sfor] = self.context[sfor]
+        sbatch = get_atrb(node, "s-batch")
+        if isinstance(sbatch, StrCode):
+            # prime the batch loaders with the keys of every item, the first row
+            # needing a value loads them all
+            array = list(array)
+            for index, item in enumerate(array):
+                self.context[sfor] = item
+                self.context["index"] = index
+                eval(sbatch.code, self.context)
         for index, item in enumerate(array):
             self.context[sfor] = item
             self.context["index"] = index
@@ -792,7 +810,7 @@ class Transformer:
     def pack_with(
         self, attrs: AstAttrs, store: dict[str, Any], reset: list[str]
     ) -> None:
-        for key, val, span in attrs:
+        for key, val in attrs:
             if isinstance(val, StrCode):
                 reset.append(key)
                 if key in self.context:
@@ -802,7 +820,7 @@ class Transformer:
     def pack_defaults(
         self, attrs: AstAttrs, store: dict[str, Any], reset: list[str]
     ) -> None:
-        for key, val, span in attrs:
+        for key, val in attrs:
             if isinstance(val, StrCode) and key not in self.context:
                 reset.append(key)
                 self.context[key] = eval(val.code, self.context)
@@ -846,7 +864,7 @@ class Transformer:
                     if len(loc) > depth and loc[depth] == index:
                         return True
             elif target.startswith("+"):
-                loc = self.map["layouts"].get(target[1:], [-1])
+                loc = self.map["layouts"].get(target[1:], (-1,))
                 if len(loc) > depth and loc[depth] == index:
                     return True
             elif target.startswith(pos):
@@ -1,10 +1,12 @@
 from collections.abc import Iterable, Iterator
 from types import CodeType
-from typing import NamedTuple, NotRequired, Self, TypedDict, cast, overload
+from typing import NamedTuple, Self, TypedDict, cast, overload
 
 from django.template.backends.django import Template
 from typing_extensions import TypeIs
 
+from picomet.interning import intern_attr, intern_code, intern_str
+
 
 class UndefinedType:
     def __str__(self) -> str:
@@ -36,7 +38,7 @@ class StrCode:
     def __init__(self, string: str, filename: str):
         self.string: str = string
         self.filename: str = filename
-        self.code: CodeType = compile(string, filename, "eval")
+        self.code: CodeType = intern_code(string, filename)
 
 
 class DoubleQuoteEscapedStr(str):
@@ -45,14 +47,18 @@ class DoubleQuoteEscapedStr(str):
         return cast(Self, super().__add__(rhs))
 
 
-class Position(TypedDict):
-    row: int
-    col: int
+class AssetUrl(DoubleQuoteEscapedStr):
+    """
+    The path of an asset whose build url is only known once its compile job
+    is done, it is saved as the url.
+    """
+
 
+# start row, start col, end row, end col
+type Span = tuple[int, int, int, int]
 
-class Span(TypedDict):
-    start: Position
-    end: Position
+# the span of an element and the spans of its attributes by name
+type Spans = list[tuple[Span, dict[str, Span]]]
 
 
 type Loops = list[tuple[str, int]]
@@ -61,10 +67,17 @@ type PureAttrs = list[tuple[str, DoubleQuoteEscapedStr | None]]
 type AstAttrValue = DoubleQuoteEscapedStr | StrCode | None
 
 
+class Asset(NamedTuple):
+    """A compiled asset, saved as fname in the assets folder."""
+
+    fname: str
+    hash: str
+    size: int
+
+
 class AstAttr(NamedTuple):
     key: str
     val: AstAttrValue
-    span: Span | None
 
 
 type AstAttrs = list[AstAttr]
@@ -118,42 +131,70 @@ class AstAttrsDynamic(Iterable[AstAttr]):
 type EscapedAttr = tuple[str, DoubleQuoteEscapedStr | None]
 type EscapedAttrs = list[EscapedAttr]
 
-type AstElement = Ast | ElementDoubleTag | ElementSingleTag
-type AstNode = Ast | ElementDoubleTag | ElementSingleTag | str | StrCode | Template
+type AstElement = ElementDoubleTag | ElementSingleTag
+type AstNode = ElementDoubleTag | ElementSingleTag | str | StrCode | Template
 
 
-class ElementDoubleTag(TypedDict):
-    tag: str
-    attrs: AstAttrs
-    children: list[AstNode]
-    span: NotRequired[Span]
-    parent: "ElementDoubleTag | Ast"
-    file: NotRequired[str]
-    isBase: NotRequired[bool]
+class ElementSingleTag:
+    """
+    ``index`` points to the spans of the element in the spans of its comet, it
+    is -1 when they are not recorded.
+    """
 
+    __slots__ = ("tag", "attrs", "index")
+
+    def __init__(self, tag: str, attrs: AstAttrs, index: int = -1):
+        attrs[:] = map(intern_attr, attrs)
+        self.tag: str = intern_str(tag)
+        self.attrs: AstAttrs = attrs
+        self.index: int = index
 
-class ElementSingleTag(TypedDict):
-    tag: str
-    attrs: AstAttrs
-    span: Span
-    parent: "ElementDoubleTag | Ast"
+
+class ElementDoubleTag:
+    __slots__ = ("tag", "attrs", "index", "children", "file", "isBase")
+
+    def __init__(
+        self,
+        tag: str,
+        attrs: AstAttrs,
+        children: list[AstNode] | None = None,
+        index: int = -1,
+        file: str | None = None,
+        isBase: bool = False,
+    ):
+        attrs[:] = map(intern_attr, attrs)
+        self.tag: str = intern_str(tag)
+        self.attrs: AstAttrs = attrs
+        self.index: int = index
+        self.children: list[AstNode] = [] if children is None else children
+        self.file: str | None = file
+        self.isBase: bool = isBase
+
+
+type Ast = ElementDoubleTag
+
+
+type Loc = tuple[int, ...]
+
+# a str splices in the children loc of the component at that path
+type SubLoc = tuple[int | str, ...]
 
 
 class AstMap(TypedDict):
-    groups: dict[str, list[list[int]]]
-    params: dict[str, list[list[int]]]
-    layouts: dict[str, list[int]]
-    files: dict[str, list[list[int]]]
-    children: list[int]
+    groups: dict[str, list[Loc]]
+    params: dict[str, list[Loc]]
+    layouts: dict[str, Loc]
+    files: dict[str, list[Loc]]
+    children: Loc
 
 
-class Ast(TypedDict):
-    tag: str
-    attrs: AstAttrs
-    children: list[AstNode]
-    parent: ElementDoubleTag | None
-    file: NotRequired[str]
-    isBase: NotRequired[bool]
+class AstSubMap(TypedDict):
+    groups: dict[str, list[SubLoc]]
+    params: dict[str, list[SubLoc]]
+    layouts: dict[str, SubLoc]
+    files: dict[str, list[SubLoc]]
+    children: SubLoc
+    mounts: list[tuple[SubLoc, str]]
 
 
 class AstElWithAttrs(TypedDict):
@@ -161,10 +202,8 @@ class AstElWithAttrs(TypedDict):
 
 
 def isNodeElement(node: AstNode) -> TypeIs[AstElement]:
-    return isinstance(node, dict)
+    return isinstance(node, ElementDoubleTag | ElementSingleTag)
 
 
-def isNodeWithChildren(node: AstNode) -> TypeIs[Ast | ElementDoubleTag]:
-    if isNodeElement(node):
-        return "children" in node
-    return False
+def isNodeWithChildren(node: AstNode) -> TypeIs[ElementDoubleTag]:
+    return isinstance(node, ElementDoubleTag)
@@ -1,4 +1,5 @@
-from hashlib import md5
+import os
+from hashlib import file_digest, md5
 from types import CodeType
 from typing import Any, Protocol
 
@@ -7,7 +8,10 @@ from htmst.structures import Pos
 from picomet.types import (
     AstAttrs,
     AstAttrsDynamic,
+    AstElement,
     AstElWithAttrs,
+    ElementDoubleTag,
+    ElementSingleTag,
     Span,
     StrCode,
     Undefined,
@@ -19,19 +23,21 @@ from picomet.types import (
 
 
 def has_atrb(attrs: AstAttrs | AstAttrsDynamic, names: list[str]) -> bool:
-    for k, v, span in attrs:
+    for k, v in attrs:
         if k in names:
             return True
     return False
 
 
 def get_atrb(
-    obj: AstElWithAttrs | AstAttrs,
+    obj: AstElement | AstElWithAttrs | AstAttrs,
     name: str,
     default: DQES | UndefinedType = Undefined,
 ) -> DQES | StrCode | None | UndefinedType:
     attrs: AstAttrs
-    if isinstance(obj, dict):
+    if isinstance(obj, ElementDoubleTag | ElementSingleTag):
+        attrs = obj.attrs
+    elif isinstance(obj, dict):
         attrs = obj["attrs"]
     else:
         attrs = obj
@@ -65,16 +71,25 @@ class Node(Protocol):
 
 
 def get_span(node: Node) -> Span:
-    return {
-        "start": node.start.to_json(),
-        "end": node.end.to_json(),
-    }
+    return (node.start.row, node.start.col, node.end.row, node.end.col)
 
 
 def mdhash(string: str, length: int) -> str:
     return md5(string.encode()).hexdigest()[:length]
 
 
+def file_hash(path: str) -> str:
+    """The md5 of the bytes of path, read in chunks."""
+    with open(path, "rb") as f:
+        return file_digest(f, md5).hexdigest()
+
+
+def get_fstat(path: str) -> str:
+    """The mtime, size and inode of path, they change when the file is written."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}:{stat.st_ino}"
+
+
 def escape_double_quote(s: str) -> DQES:
     """
     Replace double quote (") characters to HTML-safe sequence.
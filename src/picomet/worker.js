@@ -0,0 +1,95 @@
+/* eslint-disable jsdoc/require-param-description */
+/* eslint-disable jsdoc/require-returns-description */
+const readline = require("readline");
+
+// stdout carries the responses, anything the compilers log goes to stderr
+console.log = console.error;
+console.info = console.error;
+
+/** @type {any} */
+let sassCompiler;
+
+const methods = {
+  /**
+   * @param {{module: string}} params
+   * @returns {Promise<string>}
+   */
+  async version({ module }) {
+    const required = require(module);
+    return String(required.version || required.info);
+  },
+  /**
+   * @param {{contents: string, target: string, minify: boolean}} params
+   * @returns {Promise<string>}
+   */
+  async ts({ contents, target, minify }) {
+    const result = await require("esbuild").transform(contents, {
+      loader: "ts",
+      target,
+      minify,
+    });
+    return result.code;
+  },
+  /**
+   * @param {{contents: string, loadPaths: string[], style: string}} params
+   * @returns {Promise<string>}
+   */
+  async sass({ contents, loadPaths, style }) {
+    if (sassCompiler === undefined) {
+      const sass = require("sass");
+      sassCompiler = sass.initAsyncCompiler
+        ? await sass.initAsyncCompiler()
+        : sass;
+    }
+    const result = await sassCompiler.compileStringAsync(contents, {
+      loadPaths,
+      style,
+    });
+    return result.css;
+  },
+  /**
+   * @param {{inputCss: string, tailwindConf: string, postcssConf: string, destDir: string, id: string, content: string[], DEBUG: boolean}} params
+   * @returns {Promise<[string, string, string, number]>}
+   */
+  async tailwind({
+    inputCss,
+    tailwindConf,
+    postcssConf,
+    destDir,
+    id,
+    content,
+    DEBUG,
+  }) {
+    return await require("./tailwind.js").compile(
+      inputCss,
+      tailwindConf,
+      postcssConf,
+      destDir,
+      id,
+      content,
+      DEBUG,
+    );
+  },
+};
+
+/**
+ * Run a request and write its response, requests run concurrently and are
+ * answered as they finish.
+ * @param {{id: number, method: string, params: any}} request
+ */
+async function handle({ id, method, params }) {
+  const start = performance.now();
+  let response;
+  try {
+    const result = await methods[method](params);
+    response = { id, result, ms: performance.now() - start };
+  } catch (e) {
+    response = { id, error: String((e && e.stack) || e) };
+  }
+  process.stdout.write(JSON.stringify(response) + "\n");
+}
+
+readline
+  .createInterface({ input: process.stdin })
+  .on("line", (line) => handle(JSON.parse(line)))
+  .on("close", () => process.exit(0));